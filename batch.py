@@ -0,0 +1,134 @@
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# the grammar is built on the first parse, so every worker builds it once,
+# for the first file it compiles
+from figures import Figures
+from parser import parse
+from plastix import Plastix, load
+from resolver import Resolver
+
+def expand(paths):
+    """Yield (path, name) for every file in paths and every .tix file under
+    the directories in paths, name being the path of the output relative to
+    the output directory."""
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path, os.path.splitext(os.path.basename(path))[0] + ".tex"
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for f in sorted(files):
+                if f.endswith(".tix"):
+                    full = os.path.join(root, f)
+                    name = os.path.relpath(full, path)
+                    yield full, os.path.splitext(name)[0] + ".tex"
+
+def clashes(files):
+    """Messages for the (path, name) of files whose output name is already
+    that of a file before them."""
+    owners = {}
+    messages = []
+    for path, name in files:
+        owner = owners.setdefault(name, path)
+        if owner != path:
+            messages.append("%s: output %s is also that of %s" %
+                            (path, name, owner))
+    return messages
+
+# the parse cache of every cache directory this worker used
+_caches = {}
+
+def compile_file(path, name, outdir=None, lexed=True, cache=None,
+                 limit=256 << 20, longtable=None, assets=None,
+                 thumbnails=None):
+    """Compile one file, parsing it through a cache.ParseCache of limit
+    bytes in the directory cache if given, and its figures through a
+    figures.Figures with assets and thumbnails. Returns (path, latex, size,
+    messages, error, hit); latex is None when it was written to outdir or
+    the file failed, hit tells whether the parse came from the cache."""
+    messages = []
+    hit = False
+    try:
+        content = load(path)
+        if cache:
+            if cache not in _caches:
+                from cache import ParseCache
+                _caches[cache] = ParseCache(cache, limit)
+            hits = _caches[cache].hits
+            blocks = _caches[cache].parse(content, lexed)
+            hit = _caches[cache].hits > hits
+        else:
+            blocks = parse(content, lexed=lexed)
+        figures = Figures(os.path.dirname(path), assets, thumbnails)
+        resolver = Resolver()
+        try:
+            latex = Plastix(blocks, longtable=longtable,
+                            figures=figures).latex(resolver)
+        finally:
+            figures.close()
+        messages = resolver.diagnostics
+        size = len(content.encode("utf-8"))
+        if outdir:
+            out = os.path.join(outdir, name)
+            os.makedirs(os.path.dirname(out), exist_ok=True)
+            with open(out, "w") as f:
+                f.write(latex)
+            latex = None
+        return path, latex, size, messages, None, hit
+    except Exception as e:
+        return path, None, 0, messages, "%s: %s" % (type(e).__name__, e), hit
+
+def compile_all(paths, jobs=None, outdir=None, lexed=True, cache=None,
+                limit=256 << 20, longtable=None, assets=None,
+                thumbnails=None):
+    """Compile paths in a pool of jobs processes, yielding the results of
+    compile_file in the order of paths."""
+    files = list(expand(paths))
+    with ProcessPoolExecutor(jobs) as pool:
+        futures = [pool.submit(compile_file, path, name, outdir, lexed,
+                               cache, limit, longtable, assets, thumbnails)
+                   for path, name in files]
+        for future in futures:
+            yield future.result()
+
+def run(paths, jobs=None, outdir=None, lexed=True, cache=None,
+        limit=256 << 20, longtable=None, assets=None, thumbnails=None,
+        out=sys.stdout, log=sys.stderr):
+    """Compile paths, writing the LaTeX of every file in order to out
+    unless outdir is given. Returns the number of files that failed."""
+    if outdir:
+        # one would overwrite the other
+        messages = clashes(expand(paths))
+        for message in messages:
+            log.write(message + "\n")
+        if messages:
+            return len(messages)
+    start = time.perf_counter()
+    done = failed = size = hits = 0
+    for path, latex, n, messages, error, hit in \
+            compile_all(paths, jobs, outdir, lexed, cache, limit, longtable,
+                        assets, thumbnails):
+        hits += hit
+        for message in messages:
+            log.write("%s: %s\n" % (path, message))
+        if error:
+            log.write("%s: %s\n" % (path, error))
+            failed += 1
+            continue
+        if latex is not None:
+            out.write(latex)
+        done += 1
+        size += n
+    elapsed = time.perf_counter() - start
+    log.write("%d documents, %d failed, %.2f MB in %.3fs: "
+              "%.1f documents/s, %.2f MB/s\n" %
+              (done, failed, size / 1e6, elapsed,
+               done / elapsed if elapsed else 0.0,
+               size / 1e6 / elapsed if elapsed else 0.0))
+    if cache:
+        log.write("parse cache: %d hits, %d misses\n" %
+                  (hits, done + failed - hits))
+    return failed
@@ -0,0 +1,111 @@
+import argparse
+import random
+import sys
+
+WORDS = ["lorem", "ipsum", "dolor", "sit", "amet", "consectetur",
+         "adipiscing", "elit", "sed", "do", "eiusmod", "tempor",
+         "incididunt", "ut", "labore", "et", "dolore", "magna", "aliqua"]
+
+EMPHASIS = [("*", "*"), ("//", "//"), ("_", "_"), ("<", ":red>")]
+
+# Every axis a document can be scaled along, with its default. Each is
+# independent of the others, so the cost of one feature can be measured
+# while the rest of the document stays the same.
+DEFAULTS = { "sections": 20     # sections in the document
+           , "paragraph": 4     # lines per paragraph
+           , "depth": 2         # nesting depth of inline emphasis
+           , "list_depth": 0    # nesting depth of the list in every section
+           , "table_rows": 0    # rows of the table in every section
+           , "footnotes": 10    # footnotes in the document
+           , "references": 10   # references in the document
+           }
+
+# paragraphs per section
+PARAGRAPHS = 3
+
+
+class Generator:
+    """Generate a plastix document. The same seed and sizes always give
+    the same document."""
+
+    def __init__(self, seed=0, **sizes):
+        self.rnd = random.Random(seed)
+        self.sizes = dict(DEFAULTS, **sizes)
+
+    def words(self, lo=2, hi=8):
+        return ' '.join(self.rnd.choice(WORDS)
+                        for _ in range(self.rnd.randint(lo, hi)))
+
+    def nested(self, depth):
+        # a different emphasis at every level, the grammar backtracks badly
+        # on runs of the same marker
+        text = self.words(1, 3)
+        for level in range(depth):
+            before, after = EMPHASIS[level % len(EMPHASIS)]
+            text = "%s%s %s%s" % (before, text, self.words(1, 2), after)
+        return text
+
+    def line(self):
+        return "%s %s %s" % (self.words(), self.nested(self.sizes["depth"]),
+                             self.words())
+
+    def paragraph(self, marks=""):
+        lines = [self.line() for _ in range(self.sizes["paragraph"])]
+        return '\n'.join(lines) + marks + "\n\n"
+
+    def section(self, n, marks):
+        out = ["== Section %d\n\n" % n, self.paragraph(marks)]
+        out += [self.paragraph() for _ in range(PARAGRAPHS - 1)]
+        if self.sizes["list_depth"]:
+            out.append(self.list())
+        if self.sizes["table_rows"]:
+            out.append(self.table())
+        return ''.join(out)
+
+    def list(self):
+        out = []
+        for level in range(self.sizes["list_depth"]):
+            marker = "#" if level % 2 == 0 else "*"
+            out.append("%s%s %s\n" % ("  " * level, marker, self.words()))
+        return ''.join(out) + "\n"
+
+    def table(self):
+        hline = "-----\n"
+        out = [hline]
+        for _ in range(self.sizes["table_rows"]):
+            out.append("| %s | %s |\n" % (self.words(1, 3), self.words(1, 3)))
+            out.append(hline)
+        return ''.join(out) + "\n"
+
+    def document(self):
+        # spread footnote and citation marks over the sections
+        marks = [""] * max(self.sizes["sections"], 1)
+        for n in range(self.sizes["footnotes"]):
+            marks[n % len(marks)] += " note^#"
+        for n in range(self.sizes["references"]):
+            marks[n % len(marks)] += " see [ref%d]" % n
+        out = ["= Benchmark\n\n"]
+        out += [self.section(n, marks[n]) for n in range(self.sizes["sections"])]
+        out += ["#: %s\n" % self.words() for _ in range(self.sizes["footnotes"])]
+        out += ["\n"]
+        out += ["[ref%d]: %s\n" % (n, self.words())
+                for n in range(self.sizes["references"])]
+        return ''.join(out)
+
+
+def generate(seed=0, **sizes):
+    return Generator(seed, **sizes).document()
+
+def main():
+    argparser = argparse.ArgumentParser(
+            description="Write a generated plastix document to stdout.")
+    argparser.add_argument("--seed", type=int, default=0)
+    for axis, default in DEFAULTS.items():
+        argparser.add_argument("--" + axis.replace("_", "-"), type=int,
+                default=default)
+    args = vars(argparser.parse_args())
+    seed = args.pop("seed")
+    sys.stdout.write(generate(seed, **args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import argparse
+import random
+import sys
+import time
+
+from benchmarks.corpus import generate
+from escape import TABLE, escape
+from lexer import tokenize
+
+def chained(text):
+    """Escape text with a replace() per special, the backslash kept out of
+    the way of the ones written after it."""
+    text = text.replace("\\", "\0")
+    for c, latex in TABLE.items():
+        if c != ord("\\"):
+            text = text.replace(chr(c), latex)
+    return text.replace("\0", "\\textbackslash{}")
+
+def translated(text):
+    return text.translate(TABLE)
+
+def runs(source):
+    """The text runs of source, as the AST holds them."""
+    return [t for t in tokenize(source) if t[0] not in "\n =!"]
+
+def sprinkle(texts, rate, seed=0):
+    """texts with about rate of their chars replaced by specials."""
+    rng = random.Random(seed)
+    specials = [chr(c) for c in TABLE]
+    out = []
+    for text in texts:
+        chars = list(text)
+        for i in range(len(chars)):
+            if rng.random() < rate:
+                chars[i] = rng.choice(specials)
+        out.append(''.join(chars))
+    return out
+
+def best(f, texts, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in texts:
+            f(text)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+def main():
+    argparser = argparse.ArgumentParser(
+            description="Time LaTeX escaping of the text of a document.")
+    argparser.add_argument("--sections", type=int, default=160)
+    argparser.add_argument("--repeat", type=int, default=5)
+    argparser.add_argument("--seed", type=int, default=0)
+    args = argparser.parse_args()
+
+    texts = runs(generate(args.seed, sections=args.sections))
+    sys.stderr.write("%d runs, %d chars\n" %
+                     (len(texts), sum(map(len, texts))))
+    for rate in (0.0, 0.001, 0.01, 0.1):
+        sample = sprinkle(texts, rate, args.seed)
+        for text in sample:
+            if not chained(text) == translated(text) == escape(text):
+                raise AssertionError("escapes differ for %r" % text)
+        times = [best(f, sample, args.repeat)
+                 for f in (chained, translated, escape)]
+        sys.stderr.write("specials %5.1f%%  replace %7.2fms  translate "
+                         "%7.2fms  escape %7.2fms  %5.1fx\n" %
+                         ((rate * 100,) + tuple(t * 1e3 for t in times) +
+                          (times[0] / times[2],)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import argparse
+import os
+import random
+import struct
+import sys
+import tempfile
+import time
+import zlib
+
+from figures import Figures, dimensions
+
+def png(width, height, noise):
+    """A grey PNG of width x height, noise bytes of it random so the files
+    don't compress to nothing."""
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + \
+               struct.pack(">I", zlib.crc32(kind + data))
+    rows = b"".join(b"\0" + noise[:width] + bytes(max(0, width - len(noise)))
+                    for _ in range(height))
+    return b"\x89PNG\r\n\x1a\n" + \
+           chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 0, 0, 0,
+                                      0)) + \
+           chunk(b"IDAT", zlib.compress(rows, 1)) + chunk(b"IEND", b"")
+
+def jpeg(width, height, padding):
+    """The headers of a JPEG of width x height behind padding bytes of
+    APP segments, enough for dimensions() but not for a decoder."""
+    out = [b"\xff\xd8"]
+    while padding > 0:
+        n = min(padding, 0xfff0)
+        out.append(b"\xff\xe1" + struct.pack(">H", n + 2) + bytes(n))
+        padding -= n
+    out.append(b"\xff\xc0" + struct.pack(">HBHHB", 11, 8, height, width, 1) +
+               b"\x01\x11\x00")
+    out.append(b"\xff\xd9")
+    return b"".join(out)
+
+def images(directory, count, seed=0):
+    """Write count images to directory, a document including them all and
+    return the path of the document."""
+    rng = random.Random(seed)
+    noise = bytes(rng.randrange(256) for _ in range(4096))
+    lines = []
+    for i in range(count):
+        width, height = rng.randrange(50, 2000), rng.randrange(50, 2000)
+        if i % 2:
+            name, data = "%d.png" % i, png(width, min(height, 200), noise)
+        else:
+            name, data = "%d.jpg" % i, jpeg(width, height, 1 << 16)
+        with open(os.path.join(directory, name), "wb") as f:
+            f.write(data)
+        lines.append("!%s fig:%d\nImage %d.\n\n" % (name, i, i))
+    path = os.path.join(directory, "figures.tix")
+    with open(path, "w") as f:
+        f.write("".join(lines))
+    return path
+
+def resolve(directory, names, jobs):
+    start = time.perf_counter()
+    figures = Figures(directory, jobs=jobs)
+    for name in names:
+        figures.submit(name)
+    for name in names:
+        figures.get(name)
+    figures.close()
+    return time.perf_counter() - start
+
+def main():
+    argparser = argparse.ArgumentParser(
+            description="Time resolving and measuring the images of a "
+                        "document, one at a time and in a thread pool.")
+    argparser.add_argument("--images", type=int, default=500)
+    argparser.add_argument("--jobs", type=int, nargs="*", default=[1, 4, 16])
+    argparser.add_argument("--seed", type=int, default=0)
+    args = argparser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        images(directory, args.images, args.seed)
+        names = sorted(n for n in os.listdir(directory)
+                       if not n.endswith(".tix"))
+        start = time.perf_counter()
+        for name in names:
+            if dimensions(os.path.join(directory, name)) is None:
+                raise AssertionError("no dimensions for %s" % name)
+        sys.stderr.write("%d images, headers read in %.2fms\n" %
+                         (len(names), (time.perf_counter() - start) * 1e3))
+        for jobs in args.jobs:
+            sys.stderr.write("%3d threads  %7.2fms\n" %
+                             (jobs, resolve(directory, names, jobs) * 1e3))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+from benchmarks.corpus import generate
+from parser import parse
+from plastix import Plastix, load
+
+# sizes every axis is swept over, the other axes keep their defaults
+AXES = { "sections": [10, 40, 160]
+       , "paragraph": [2, 8, 32]
+       , "depth": [1, 2, 4, 8]
+       , "list_depth": [2, 8, 32]
+       , "table_rows": [4, 16, 64]
+       , "footnotes": [10, 100, 1000]
+       , "references": [10, 100, 1000]
+       }
+
+PHASES = ["load", "parse", "render"]
+
+def phases(path, lexed=True, engine="combinators"):
+    """Run the pipeline on the file at path once, yielding the name of every
+    phase with the seconds it took."""
+    clock = time.perf_counter
+
+    start = clock()
+    content = load(path)
+    yield "load", clock() - start
+
+    start = clock()
+    if engine == "generated":
+        from generated import parse as generated
+        blocks = generated(content)
+    else:
+        blocks = parse(content, lexed=lexed)
+    yield "parse", clock() - start
+
+    # references are resolved while rendering, in the same pass
+    start = clock()
+    Plastix(blocks).latex()
+    yield "render", clock() - start
+
+def measure(source, repeat=3, lexed=True, engine="combinators"):
+    """Best time of every phase over repeat runs. A phase that fails is
+    reported with its error instead, and ends the run."""
+    times = {}
+    errors = {}
+    with tempfile.NamedTemporaryFile("w", suffix=".tix", delete=False) as f:
+        f.write(source)
+    try:
+        for _ in range(repeat):
+            done = 0
+            try:
+                for name, seconds in phases(f.name, lexed, engine):
+                    times[name] = min(seconds, times.get(name, seconds))
+                    done += 1
+            except Exception as e:
+                errors[PHASES[done]] = "%s: %s" % (type(e).__name__, e)
+                break
+    finally:
+        os.unlink(f.name)
+    return times, errors
+
+def bench(axes, repeat=3, lexed=True, seed=0, engine="combinators",
+          log=sys.stderr):
+    results = []
+    for axis in axes:
+        for size in AXES[axis]:
+            source = generate(seed, **{axis: size})
+            times, errors = measure(source, repeat, lexed, engine)
+            results.append({ "axis": axis, "size": size,
+                             "bytes": len(source.encode("utf-8")),
+                             "times": times, "errors": errors })
+            log.write("%-11s %5d %8d B  %s\n" % (axis, size, len(source),
+                ' '.join("%s %.4fs" % (p, times[p]) if p in times
+                         else "%s -" % p for p in PHASES)))
+    return results
+
+def compare(results, baseline, threshold=0.1, floor=0.001, log=sys.stderr):
+    """Compare results with a baseline run, returning the number of phases
+    that got slower by more than threshold. Phases that took less than
+    floor seconds in both runs are too noisy to count."""
+    old = {(r["axis"], r["size"]): r["times"] for r in baseline["results"]}
+    regressions = 0
+    for r in results:
+        before = old.get((r["axis"], r["size"]))
+        if before is None:
+            continue
+        for phase in PHASES:
+            if phase not in before or phase not in r["times"]:
+                continue
+            ratio = r["times"][phase] / before[phase] if before[phase] else 1.0
+            mark = ""
+            if ratio > 1 + threshold and r["times"][phase] >= floor:
+                mark = "  REGRESSION"
+                regressions += 1
+            log.write("%-11s %5d %-10s %9.4fs -> %9.4fs %6.2fx%s\n" %
+                    (r["axis"], r["size"], phase, before[phase],
+                     r["times"][phase], ratio, mark))
+    return regressions
+
+def main():
+    argparser = argparse.ArgumentParser(
+            description="Time every phase of plastix on generated documents.")
+    argparser.add_argument("axes", nargs="*",
+            help="axes to sweep, all of them by default: %s" % ', '.join(AXES))
+    argparser.add_argument("-o", "--output",
+            help="write the results as JSON to this file instead of stdout")
+    argparser.add_argument("--baseline",
+            help="JSON results of an earlier run to compare against")
+    argparser.add_argument("--threshold", type=float, default=0.1,
+            help="slowdown that counts as a regression (default 0.1 = 10%%)")
+    argparser.add_argument("--floor", type=float, default=0.001,
+            help="ignore slowdowns of phases faster than this many seconds")
+    argparser.add_argument("--repeat", type=int, default=3)
+    argparser.add_argument("--seed", type=int, default=0)
+    argparser.add_argument("--no-lexer", action="store_true",
+            help="parse char by char instead of lexing first")
+    argparser.add_argument("--engine", default="combinators",
+            choices=["combinators", "generated"],
+            help="parser to time, see plastix.py --engine")
+    args = argparser.parse_args()
+    for axis in args.axes:
+        if axis not in AXES:
+            argparser.error("unknown axis %s" % axis)
+
+    results = bench(args.axes or list(AXES), args.repeat,
+            not args.no_lexer, args.seed, args.engine)
+    report = { "python": platform.python_version(),
+               "lexed": not args.no_lexer,
+               "engine": args.engine,
+               "seed": args.seed,
+               "results": results }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.threshold, args.floor):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
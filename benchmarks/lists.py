@@ -0,0 +1,36 @@
+import argparse
+import random
+import sys
+
+from benchmarks.tables import measure
+from generated import parse
+
+def outline(items, depth, seed=0):
+    """A document holding one list of items items, wandering up and down
+    to depth levels."""
+    rng = random.Random(seed)
+    out = ["* top\n"]
+    level = 0
+    for i in range(items):
+        level = max(0, min(depth - 1, level + rng.choice([-2, -1, 0, 1, 1])))
+        marker = "* " if level == 0 else rng.choice("*#") + " "
+        out.append("  " * level + marker + "item %d\n" % i)
+    return ''.join(out)
+
+def main():
+    argparser = argparse.ArgumentParser(
+            description="Measure rendering time and memory of long lists.")
+    argparser.add_argument("--items", type=int, nargs="*",
+            default=[2000, 20000, 200000])
+    argparser.add_argument("--depth", type=int, default=12)
+    argparser.add_argument("--seed", type=int, default=0)
+    args = argparser.parse_args()
+
+    for items in args.items:
+        blocks = parse(outline(items, args.depth, args.seed))
+        seconds, peak = measure(blocks, None)
+        sys.stderr.write("%7d items  %6.2fs %8.1f KB\n" %
+                         (items, seconds, peak / 1024))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import argparse
+import random
+import tracemalloc
+
+from parser import grammar, parse
+
+WORDS = ["lorem", "ipsum", "dolor", "sit", "amet", "consectetur",
+         "adipiscing", "elit", "sed", "do", "eiusmod", "tempor"]
+
+def inline(rnd, depth=0):
+    r = rnd.random()
+    if depth < 3 and r < 0.1:
+        return "*%s*" % inline(rnd, depth + 1)
+    if depth < 3 and r < 0.2:
+        return "//%s//" % inline(rnd, depth + 1)
+    if depth < 3 and r < 0.25:
+        return "_%s_" % inline(rnd, depth + 1)
+    return ' '.join(rnd.choice(WORDS) for _ in range(rnd.randint(1, 8)))
+
+def document(size, seed=0):
+    """A document of about size bytes of sections and paragraphs."""
+    rnd = random.Random(seed)
+    out = []
+    length = 0
+    while length < size:
+        if rnd.random() < 0.1:
+            block = "== %s\n\n" % inline(rnd)
+        else:
+            lines = [' '.join(inline(rnd) for _ in range(rnd.randint(1, 6)))
+                     for _ in range(rnd.randint(1, 5))]
+            block = '\n'.join(lines) + "\n\n"
+        out.append(block)
+        length += len(block)
+    return ''.join(out)
+
+# dict based copies of the node classes, what they were without __slots__
+_plain = {}
+
+class String:
+    """A text run as a node of its own, as it was before runs were plain
+    strs."""
+
+def plain(value, inline=False):
+    """A copy of an AST as it was before the nodes had __slots__: nodes
+    with a __dict__, lists for children, a String node for every text run
+    and text that isn't interned."""
+    cls = type(value)
+    if cls is str:
+        value = (value + ".")[:-1]
+        if not inline:
+            return value
+        node = String()
+        node.string = value
+        return node
+    if cls is tuple or cls is list:
+        # a str among children is a text run
+        return [plain(v, True) for v in value]
+    if not hasattr(cls, "__slots__"):
+        return value
+    if cls not in _plain:
+        _plain[cls] = type(cls.__name__, (), {})
+    node = _plain[cls]()
+    for name in cls.__slots__:
+        setattr(node, name, plain(getattr(value, name)))
+    return node
+
+def traced(f, *args):
+    """Bytes allocated by f(*args) that are still held after it returns."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    value = f(*args)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return value, after - before
+
+def measure(source):
+    """Bytes held by the AST of source per KB of source, with the nodes
+    as they are and as they were before they had __slots__ and text runs
+    were plain strs."""
+    # built on the first parse, and not part of the AST
+    grammar()
+    kb = len(source) / 1024
+    ast, slotted = traced(parse, source)
+    copy, dicts = traced(plain, ast)
+    del ast, copy
+    return dicts / kb, slotted / kb
+
+def main():
+    argparser = argparse.ArgumentParser(
+            description="Report the memory used by the AST of a generated document.")
+    argparser.add_argument("--size", type=int, default=1 << 20,
+            help="size of the generated document in bytes")
+    argparser.add_argument("--seed", type=int, default=0)
+    args = argparser.parse_args()
+
+    source = document(args.size, args.seed)
+    before, after = measure(source)
+    print("%d KB source, bytes of AST per KB: %.0f before, %.0f "
+          "after, %.2fx" % (len(source) // 1024, before, after,
+                            before / after))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from benchmarks.corpus import generate
+from parallel import parse
+from parser import parse as serial
+from rendercache import structure
+
+def best(f, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = f()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+def scaling(source, jobs, repeat=3, lexed=True, log=sys.stderr):
+    """Time the serial parse of source and the parallel one on 1 to jobs
+    workers, checking every parallel parse gives the serial blocks. Returns
+    [(workers, seconds)], 0 workers being the serial parse."""
+    seconds, blocks = best(lambda: serial(source, lexed=lexed), repeat)
+    expected = structure(tuple(blocks))
+    results = [(0, seconds)]
+    log.write("serial    %8.3fs\n" % seconds)
+    for n in range(1, jobs + 1):
+        # start the workers, and build their grammar, before timing
+        with ProcessPoolExecutor(n) as pool:
+            list(pool.map(serial, ["x\n"] * n))
+            seconds, blocks = best(
+                    lambda: parse(source, lexed, n, pool), repeat)
+        if structure(tuple(blocks)) != expected:
+            raise AssertionError("parallel parse on %d workers differs" % n)
+        results.append((n, seconds))
+        log.write("%2d workers %7.3fs  %5.2fx\n" %
+                  (n, seconds, results[0][1] / seconds))
+    return results
+
+def main():
+    argparser = argparse.ArgumentParser(
+            description="Measure how parallel parsing scales with workers.")
+    argparser.add_argument("--jobs", type=int, default=os.cpu_count(),
+            help="largest number of workers (default: one per cpu)")
+    argparser.add_argument("--sections", type=int, default=200,
+            help="size of the generated document")
+    argparser.add_argument("--repeat", type=int, default=3)
+    argparser.add_argument("--seed", type=int, default=0)
+    argparser.add_argument("--no-lexer", action="store_true")
+    args = argparser.parse_args()
+
+    source = generate(args.seed, sections=args.sections)
+    sys.stderr.write("%d bytes, %d cpus\n" % (len(source), os.cpu_count()))
+    scaling(source, args.jobs, args.repeat, not args.no_lexer)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# run in a fresh interpreter: the import of the parser, and the build of the
+# grammar on first use
+PHASES = """
+import time
+start = time.perf_counter()
+import parser
+imported = time.perf_counter()
+parser.grammar(%r)
+built = time.perf_counter()
+print(imported - start, built - imported)
+"""
+
+def first_output(command):
+    """Run command, returning the seconds to its first byte of output and
+    to its exit, and its exit status."""
+    start = time.perf_counter()
+    proc = subprocess.Popen(command, cwd=ROOT, stdout=subprocess.PIPE,
+                            stderr=subprocess.DEVNULL)
+    proc.stdout.read(1)
+    first = time.perf_counter() - start
+    proc.stdout.read()
+    status = proc.wait()
+    return first, time.perf_counter() - start, status
+
+def startup(args, repeat=10, log=sys.stderr):
+    """Best time to first output and to exit of `plastix.py args` over
+    repeat runs."""
+    command = [sys.executable, os.path.join(ROOT, "plastix.py")] + args
+    runs = [first_output(command) for _ in range(repeat)]
+    first = min(r[0] for r in runs)
+    total = min(r[1] for r in runs)
+    status = runs[-1][2]
+    log.write("%-30s first output %6.1fms  exit %6.1fms%s\n" %
+              (' '.join(args), first * 1e3, total * 1e3,
+               "  (exit status %d)" % status if status else ""))
+    return first, total
+
+def phases(lexed=True, repeat=10, log=sys.stderr):
+    runs = []
+    for _ in range(repeat):
+        out = subprocess.check_output(
+                [sys.executable, "-c", PHASES % lexed], cwd=ROOT)
+        runs.append(tuple(map(float, out.split())))
+    imported = min(r[0] for r in runs)
+    built = min(r[1] for r in runs)
+    log.write("import parser %6.1fms  build %s grammar %6.1fms\n" %
+              (imported * 1e3, "lexed" if lexed else "char", built * 1e3))
+    return imported, built
+
+def main():
+    argparser = argparse.ArgumentParser(
+            description="Measure the startup time of plastix.py.")
+    argparser.add_argument("file", nargs="?", default="test.tix")
+    argparser.add_argument("--repeat", type=int, default=10)
+    args = argparser.parse_args()
+
+    startup(["--help"], args.repeat)
+    startup([args.file], args.repeat)
+    startup(["--no-lexer", args.file], args.repeat)
+    startup(["--engine", "generated", args.file], args.repeat)
+    phases(True, args.repeat)
+    phases(False, args.repeat)
+
+if __name__ == "__main__":
+    main()
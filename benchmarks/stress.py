@@ -0,0 +1,61 @@
+import argparse
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.corpus import generate
+from parser import parse
+from plastix import Plastix, load
+from resolver import Resolver
+
+def render(plastix):
+    resolver = Resolver()
+    return plastix.latex(resolver), tuple(resolver.diagnostics)
+
+def render_blocks(blocks):
+    # every block on its own, through the latex() of the node
+    return tuple(b.latex()["document"][0] for b in blocks)
+
+def stress(blocks, threads=8, renders=64, log=sys.stderr):
+    """Render the same blocks renders times from a pool of threads and
+    return how many renders differ from a render done alone."""
+    plastix = Plastix(blocks)
+    expected = render(plastix)
+    expected_blocks = render_blocks(blocks)
+    # switch threads as often as possible to interleave the renders
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        with ThreadPoolExecutor(threads) as pool:
+            whole = [pool.submit(render, plastix) for _ in range(renders)]
+            single = [pool.submit(render_blocks, blocks)
+                      for _ in range(renders)]
+            whole = [f.result() for f in whole]
+            single = [f.result() for f in single]
+    finally:
+        sys.setswitchinterval(interval)
+    bad = sum(r != expected for r in whole) \
+        + sum(r != expected_blocks for r in single)
+    log.write("%d renders on %d threads, %d differ\n" %
+              (2 * renders, threads, bad))
+    return bad
+
+def main():
+    argparser = argparse.ArgumentParser(
+            description="Render one AST from many threads at once and check "
+                        "that every render gives the same output.")
+    argparser.add_argument("file", nargs="?",
+            help="plastix file to render, a generated document by default")
+    argparser.add_argument("--threads", type=int, default=8)
+    argparser.add_argument("--renders", type=int, default=64)
+    argparser.add_argument("--seed", type=int, default=0)
+    args = argparser.parse_args()
+
+    if args.file:
+        source = load(args.file)
+    else:
+        source = generate(args.seed, sections=40)
+    if stress(parse(source), args.threads, args.renders):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+from generated import parse
+from plastix import Plastix
+from renderer import Renderer
+
+def table(rows, columns=4):
+    """A document holding one table of rows rows."""
+    out = ["A report.\n\n", "-" * 20, "\n"]
+    for i in range(rows):
+        out.append("|%d|" % i)
+        out.append(''.join("cell %d %d|" % (i, j) for j in range(1, columns)))
+        out.append("\n" + "-" * 20 + "\n")
+    return ''.join(out)
+
+def measure(blocks, longtable):
+    """Seconds and peak bytes allocated to render blocks to /dev/null."""
+    with open(os.devnull, "w") as out:
+        tracemalloc.start()
+        start = time.perf_counter()
+        Plastix(blocks, longtable=longtable).write(out)
+        seconds = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return seconds, peak
+
+def main():
+    argparser = argparse.ArgumentParser(
+            description="Measure rendering time and memory of long tables.")
+    argparser.add_argument("--rows", type=int, nargs="*",
+            default=[1000, 10000, 100000])
+    argparser.add_argument("--longtable", type=int,
+            default=Renderer.LONGTABLE)
+    args = argparser.parse_args()
+
+    for rows in args.rows:
+        blocks = parse(table(rows))
+        chunked = measure(blocks, args.longtable)
+        # one chunk for the whole table
+        whole = measure(blocks, rows)
+        sys.stderr.write("%7d rows  chunked %6.2fs %8.1f KB  whole %6.2fs "
+                         "%8.1f KB\n" % (rows, chunked[0], chunked[1] / 1024,
+                                         whole[0], whole[1] / 1024))
+
+if __name__ == "__main__":
+    main()
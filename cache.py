@@ -0,0 +1,143 @@
+import hashlib
+import os
+import pickle
+import platform
+import tempfile
+
+from parser import parse
+
+# everything the AST of a source depends on besides the source itself
+SOURCES = ["lexer.py", "parser.py", "elements.py", "colors.py"]
+
+_fingerprint = None
+
+def funcparserlib_version():
+    # funcparserlib has no __version__
+    from importlib.metadata import PackageNotFoundError, version
+    try:
+        return version("funcparserlib")
+    except PackageNotFoundError:
+        return ""
+
+def fingerprint():
+    """Hash of the grammar and AST code and the versions they run on. An
+    entry made by a different grammar is never found."""
+    global _fingerprint
+    if _fingerprint is None:
+        h = hashlib.blake2b(digest_size=16)
+        h.update(platform.python_version().encode())
+        h.update(funcparserlib_version().encode())
+        here = os.path.dirname(os.path.abspath(__file__))
+        for name in SOURCES:
+            with open(os.path.join(here, name), "rb") as f:
+                h.update(f.read())
+        _fingerprint = h.digest()
+    return _fingerprint
+
+
+class ParseCache:
+    """Parsed documents on disk, keyed by a hash of the source, the grammar
+    fingerprint and the grammar used.
+
+    Entries are pickled blocks, one file each. They are written to a
+    temporary file and renamed into place, so concurrent builds sharing the
+    directory only ever see complete entries. A hit touches its entry; when
+    the directory grows past `limit` bytes the least recently used entries
+    are removed.
+    """
+
+    SUFFIX = ".ast"
+
+    def __init__(self, directory, limit=256 << 20):
+        self.directory = directory
+        self.limit = limit
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # bytes in the directory as of the last scan plus what was written
+        # since, so the directory is only scanned when it may be too big
+        self.size = None
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, source, lexed=True):
+        h = hashlib.blake2b(fingerprint(), digest_size=20)
+        h.update(b"lexed" if lexed else b"chars")
+        h.update(source.encode("utf-8"))
+        return h.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + ParseCache.SUFFIX)
+
+    def get(self, key):
+        path = self.path(key)
+        try:
+            with open(path, "rb") as f:
+                blocks = pickle.load(f)
+        except Exception:
+            # missing or unreadable, parse again and let put replace it
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return blocks
+
+    def put(self, key, blocks):
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(blocks, f, pickle.HIGHEST_PROTOCOL)
+                size = f.tell()
+            os.replace(tmp, self.path(key))
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        if self.size is None:
+            self.evict()
+        else:
+            self.size += size
+            if self.size > self.limit:
+                self.evict()
+
+    def evict(self):
+        entries = []
+        total = 0
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(ParseCache.SUFFIX):
+                continue
+            try:
+                st = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, entry.path))
+            total += st.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.limit:
+                break
+            try:
+                os.unlink(path)
+                self.evictions += 1
+            except FileNotFoundError:
+                # removed by another build
+                pass
+            total -= size
+        self.size = total
+
+    def parse(self, source, lexed=True):
+        """parser.parse, skipped when the same source was parsed before."""
+        key = self.key(source, lexed)
+        blocks = self.get(key)
+        if blocks is not None:
+            self.hits += 1
+            return blocks
+        self.misses += 1
+        blocks = parse(source, lexed=lexed)
+        self.put(key, blocks)
+        return blocks
+
+    def report(self):
+        total = self.hits + self.misses
+        return "parse cache: %d hits, %d misses (%.0f%%), %d evicted\n" % \
+               (self.hits, self.misses,
+                100.0 * self.hits / total if total else 0.0, self.evictions)
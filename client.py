@@ -0,0 +1,55 @@
+import argparse
+import json
+import socket
+import sys
+
+# Talks to `plastix.py --serve`. Only the standard library is imported, so
+# a request doesn't pay for building the grammar.
+
+def request(source, path=None, port=None, host="127.0.0.1", lexed=True):
+    """Send source to a daemon and return its reply."""
+    if path:
+        sock = socket.socket(socket.AF_UNIX)
+        sock.connect(path)
+    else:
+        sock = socket.create_connection((host, port))
+    with sock, sock.makefile("rwb") as f:
+        f.write(json.dumps({ "id": 0, "source": source, "lexed": lexed })
+                .encode("utf-8") + b"\n")
+        f.flush()
+        return json.loads(f.readline())
+
+def load(path):
+    # the same as plastix.load
+    with open(path, "r") as f:
+        return ''.join(line for line in f if line[0] != "%")
+
+def main():
+    argparser = argparse.ArgumentParser(
+            description="Compile a plastix file with a running plastix daemon.")
+    argparser.add_argument("file")
+    argparser.add_argument("--socket", help="unix socket of the daemon")
+    argparser.add_argument("--port", type=int,
+            help="localhost port of the daemon")
+    argparser.add_argument("--no-lexer", action="store_true",
+            help="parse the source char by char instead of lexing it first")
+    argparser.add_argument("-v", "--verbose", action="store_true",
+            help="report the latency of the request on stderr")
+    args = argparser.parse_args()
+    if not args.socket and not args.port:
+        argparser.error("give the --socket or --port of the daemon")
+
+    reply = request(load(args.file), args.socket, args.port,
+                    lexed=not args.no_lexer)
+    if "error" in reply:
+        sys.stderr.write("%s: %s\n" % (args.file, reply["error"]))
+        sys.exit(1)
+    sys.stdout.write(reply["latex"])
+    for message in reply["diagnostics"]:
+        sys.stderr.write("%s: %s\n" % (args.file, message))
+    if args.verbose:
+        sys.stderr.write(' '.join("%s %.1fms" % (k, v * 1e3)
+                         for k, v in reply["metrics"].items()) + "\n")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+import asyncio
+import json
+import os
+import signal
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from incremental import Incremental
+from parser import grammar
+from plastix import Plastix
+from rendercache import RenderCache
+from resolver import Resolver
+
+# longest request or response line, a whole document goes in one line
+LIMIT = 1 << 28
+
+# chunks every worker keeps parsed, of any of the documents it has seen
+CHUNKS = 1 << 16
+
+# kept warm in every worker: _warm builds the grammar before the first
+# request, the incremental parsers reuse the chunks parsed for earlier
+# requests
+_parsers = {}
+_cache = RenderCache()
+
+def _warm():
+    grammar(True)
+    return os.getpid()
+
+def compile_source(source, lexed=True):
+    """Parse and render source in a worker. Returns the reply without its
+    id."""
+    clock = time.perf_counter
+    start = clock()
+    if lexed not in _parsers:
+        _parsers[lexed] = Incremental(lexed, keep=CHUNKS)
+    try:
+        blocks = _parsers[lexed].parse(source)
+        parsed = clock()
+        resolver = Resolver()
+        latex = Plastix(blocks, _cache).latex(resolver)
+    except Exception as e:
+        return { "error": "%s: %s" % (type(e).__name__, e) }
+    return { "latex": latex,
+             "diagnostics": resolver.diagnostics,
+             "metrics": { "parse": parsed - start,
+                          "render": clock() - parsed } }
+
+
+class Server:
+    """Compile plastix sources sent over a socket, one JSON object per line.
+
+    A request is {"id": any, "source": str, "lexed": bool (optional)}, the
+    reply {"id", "latex", "diagnostics", "metrics"} or {"id", "error"}.
+    {"command": "stats"} replies with the latency of the requests so far.
+    Requests on one connection are compiled concurrently and answered as
+    they finish, the id tells which request a reply belongs to.
+    """
+
+    def __init__(self, jobs=None, log=sys.stderr):
+        self.pool = ProcessPoolExecutor(jobs)
+        self.jobs = jobs or os.cpu_count()
+        self.log = log
+        self.latencies = []
+
+    async def warm(self):
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*[loop.run_in_executor(self.pool, _warm)
+                               for _ in range(self.jobs)])
+
+    def stats(self):
+        latencies = sorted(self.latencies)
+        pick = lambda q: latencies[min(int(q * len(latencies)),
+                                       len(latencies) - 1)]
+        if not latencies:
+            return { "requests": 0 }
+        return { "requests": len(latencies),
+                 "p50": pick(0.5),
+                 "p95": pick(0.95),
+                 "max": latencies[-1] }
+
+    async def request(self, line):
+        start = time.perf_counter()
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            return { "id": None, "error": "bad request: %s" % e }
+        if not isinstance(request, dict):
+            return { "id": None, "error": "bad request" }
+        if request.get("command") == "stats":
+            return dict(self.stats(), id=request.get("id"))
+        if not isinstance(request.get("source"), str):
+            return { "id": request.get("id"), "error": "no source" }
+        if not isinstance(request.get("lexed", True), bool):
+            return { "id": request.get("id"), "error": "bad request" }
+        loop = asyncio.get_running_loop()
+        try:
+            reply = await loop.run_in_executor(self.pool, compile_source,
+                    request["source"], request.get("lexed", True))
+        except Exception as e:
+            # the worker died
+            reply = { "error": "%s: %s" % (type(e).__name__, e) }
+        reply["id"] = request.get("id")
+        total = time.perf_counter() - start
+        self.latencies.append(total)
+        if "metrics" in reply:
+            metrics = reply["metrics"]
+            # time spent waiting for a worker and shipping the data
+            metrics["queue"] = total - metrics["parse"] - metrics["render"]
+            metrics["total"] = total
+            self.log.write("request %s: %d bytes, parse %.1fms, render "
+                           "%.1fms, total %.1fms\n" %
+                           (reply["id"], len(request["source"]),
+                            metrics["parse"] * 1e3, metrics["render"] * 1e3,
+                            total * 1e3))
+        else:
+            self.log.write("request %s: %s\n" % (reply["id"], reply["error"]))
+        return reply
+
+    async def connection(self, reader, writer):
+        lock = asyncio.Lock()
+
+        async def answer(line):
+            reply = await self.request(line)
+            async with lock:
+                writer.write(json.dumps(reply).encode("utf-8") + b"\n")
+                await writer.drain()
+
+        tasks = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                task = asyncio.ensure_future(answer(line))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks)
+        except (ConnectionError, asyncio.LimitOverrunError, ValueError) as e:
+            self.log.write("connection closed: %s\n" % e)
+        finally:
+            writer.close()
+
+    async def serve(self, path=None, port=None, host="127.0.0.1"):
+        await self.warm()
+        if path:
+            server = await asyncio.start_unix_server(self.connection, path,
+                                                     limit=LIMIT)
+            where = path
+        else:
+            server = await asyncio.start_server(self.connection, host, port,
+                                                limit=LIMIT)
+            where = "%s:%d" % server.sockets[0].getsockname()[:2]
+        self.log.write("plastix daemon on %s with %d workers\n" %
+                       (where, self.jobs))
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        async with server:
+            await stop.wait()
+        self.log.write("plastix daemon stopped after %d requests\n" %
+                       len(self.latencies))
+
+def serve(path=None, port=None, jobs=None):
+    server = Server(jobs)
+    try:
+        asyncio.run(server.serve(path, port))
+    finally:
+        server.pool.shutdown()
+        if path and os.path.exists(path):
+            os.unlink(path)
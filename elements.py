@@ -1,41 +1,26 @@
+import sys
 
-def combine_inlines(inline, references):
-    preamble = []
-    document = []
-    for x in inline:
-        l = x.latex(references)
-        preamble += l["preamble"]
-        document += l["document"]
-    document = ''.join(document)
-    return (preamble, document)
+from renderer import render
 
 
 # blocks
 class Paragraph:
+    __slots__ = ("text", "newlines", "digest")
+
     def __init__(self, text, newlines):
-        self.text = text
+        self.text = tuple(map(tuple, text))
         self.newlines = newlines
+        # structural hash, see rendercache.digest
+        self.digest = None
 
-    def latex(self, references):
-        preamble = []
-        doc = ""
-        for text in self.text:
-            p, d = combine_inlines(text, references)
-            preamble += p
-            if len(doc) > 0:
-                doc += " "
-            doc += d
-
-        if self.newlines:
-            self.newlines = self.newlines.latex(references)
-            preamble += self.newlines["preamble"]
-            doc += self.newlines["document"][0]
-
-        return { "preamble": preamble, "document": [doc + "\n"] }
+    def latex(self, resolver=None):
+        return render(self, resolver)
 
 
 class Section:
 
+    __slots__ = ("level", "text", "digest")
+
     LATEX = { 1: "\\section{%s}"
             , 2: "\\subsection{%s}"
             , 3: "\\subsubsection{%s}"
@@ -45,30 +30,27 @@ class Section:
 
     def __init__(self, text, level=1):
         self.level = level
-        self.text = text
+        self.text = tuple(text)
+        self.digest = None
 
-    def latex(self, references):
-        preamble, doc = combine_inlines(self.text, references)
-        out = {
-                "preamble": preamble,
-                "document": [Section.LATEX[self.level] % doc + "\n"]
-                }
-        return out
+    def latex(self, resolver=None):
+        return render(self, resolver)
 
     def __repr__(self):
         return "Section: \"%s\" (%s)" % (self.text, self.level)
 
 class FootnoteRef:
 
-    def __init__(self, inline):
-        self.inline = inline
+    __slots__ = ("inline",)
 
-    def reference(self, references):
-        _, doc = combine_inlines(self.inline, references)
-        return doc
+    # the footnote the text ends up in
+    NOTE = "\\footnote{%s}"
+
+    def __init__(self, inline):
+        self.inline = tuple(inline)
 
-    def latex(self, references):
-        return { "preamble": [], "document": [] }
+    def latex(self, resolver=None):
+        return render(self, resolver)
 
 
     def __repr__(self):
@@ -95,23 +77,14 @@ class FootnoteRef:
 #         return "CodeBlock: \"%s..\"" % self.code[:cut]
 
 class Reference:
+    __slots__ = ("ident", "ref")
+
     def __init__(self, ident, reference=""):
         self.ident = ident
-        self.ref = reference
-
-    def reference(self, references):
-        preamble = []
-        doc = ""
-        for text in self.ref:
-            p, d = combine_inlines(text, references)
-            preamble += p
-            if len(doc) > 0:
-                doc += " "
-            doc += d
-        return (self.ident, doc)
-
-    def latex(self, references):
-        return { "preamble": [], "document": [] }
+        self.ref = tuple(map(tuple, reference))
+
+    def latex(self, resolver=None):
+        return render(self, resolver)
 
     def __repr__(self):
         return "Reference %s" % self.ident
@@ -139,41 +112,29 @@ class Reference:
 #             s = s.replace(e, "\\" + e)
 #         return s
 
-class String:
-    def __init__(self, string):
-        self.string = string
-
-    def latex(self, references):
-        # TODO escape stuff
-        out = {
-                "preamble": [],
-                "document": [self.string]
-                }
-        return out
-
-    def __repr__(self):
-        return self.string
-
 class Newline:
+    __slots__ = ("lines",)
+
     def __init__(self, lines):
-        self.lines = lines
+        self.lines = sys.intern(lines)
 
-    def latex(self, references):
-        return { "preamble": [], "document": [self.lines] }
+    def latex(self, resolver=None):
+        return render(self, resolver)
 
     def __repr__(self):
         return self.lines
 
 class Bold:
 
+    __slots__ = ("text",)
+
     LATEX = "\\textbf{%s}"
 
     def __init__(self, text):
-        self.text = text
+        self.text = tuple(text)
 
-    def latex(self, references):
-        preamble, doc = combine_inlines(self.text, references)
-        return { "preamble": preamble, "document": [Bold.LATEX % doc] }
+    def latex(self, resolver=None):
+        return render(self, resolver)
 
     def __repr__(self):
         text = [x.__repr__() for x in self.text]
@@ -182,14 +143,15 @@ class Bold:
 
 class Italic:
 
+    __slots__ = ("text",)
+
     LATEX = "\\textit{%s}"
 
     def __init__(self, text):
-        self.text = text
+        self.text = tuple(text)
 
-    def latex(self, references):
-        preamble, doc = combine_inlines(self.text, references)
-        return { "preamble": preamble, "document": [Italic.LATEX % doc] }
+    def latex(self, resolver=None):
+        return render(self, resolver)
 
     def __repr__(self):
         text = [x.__repr__() for x in self.text]
@@ -198,14 +160,15 @@ class Italic:
 
 class Underline:
 
+    __slots__ = ("text",)
+
     LATEX = "\\underline{%s}"
 
     def __init__(self, text):
-        self.text = text
+        self.text = tuple(text)
 
-    def latex(self, references):
-        preamble, doc = combine_inlines(self.text, references)
-        return { "preamble": preamble, "document": [Underline.LATEX % doc] }
+    def latex(self, resolver=None):
+        return render(self, resolver)
 
     def __repr__(self):
         text = [x.__repr__() for x in self.text]
@@ -214,91 +177,113 @@ class Underline:
 
 class Escaped:
 
-    SYMBOLS = { "#": "\\#" }
+    __slots__ = ("char",)
 
     def __init__(self, char):
         self.char = char
 
-    def latex(self, references):
-        return { "preamble": [], "document": Escaped.SYMBOLS[self.char] }
+    def latex(self, resolver=None):
+        return render(self, resolver)
 
     def __repr__(self):
         return self.char
 
 class Footnote:
 
-    NOTE = "\\footnote{%s}"
+    __slots__ = ()
 
-    def latex(self, references):
-        footnotes = references["footnotes"]
-        footnote = ""
-        if len(footnotes) > 0:
-            footnote = Footnote.NOTE % footnotes.pop(0)
-        else:
-            print("ERROR!! too many footnotes")
+    NOTE = "\\footnote{%s}"
 
-        return {"preamble": [], "document": [footnote] }
+    def latex(self, resolver=None):
+        return render(self, resolver)
 
     def __repr__(self):
         return "^#"
 
 class InlineRef:
+    __slots__ = ("label",)
     REF = { "ref": "\\ref{%s}",
             "cite": "\\cite{%s}" }
 
     def __init__(self, label):
         self.label = label
 
-    def latex(self, references):
-        doc = ""
-        if self.label in references["references"]:
-            ref = references["references"][self.label]
-            doc = InlineRef.REF[ref["type"]] % self.label
-        else:
-            print("Reference '%s' not defined in document" % self.label)
-        return { "preamble": [], "document": [doc] }
+    def latex(self, resolver=None):
+        return render(self, resolver)
 
 
 class Color:
 
+    __slots__ = ("text", "color")
+
     def __init__(self, text, color):
-        self.text = text
+        self.text = tuple(text)
         self.color = color
 
+    def latex(self, resolver=None):
+        return render(self, resolver)
+
     def __repr__(self):
         return "%s:%s" % (self.text, self.color)
 
 class Figure:
+    __slots__ = ("path", "label", "caption")
+
     def __init__(self, path, label=None, caption=None):
         self.path = path
         self.label = label
-        self.caption = caption
+        self.caption = tuple(map(tuple, caption)) if caption else None
+
+    def latex(self, resolver=None):
+        return render(self, resolver)
 
     def __repr__(self):
         return "img[%s]" % self.path
 
 class List:
+    __slots__ = ("listType", "items", "digest")
+
     def __init__(self, listType, items):
         self.listType = listType
-        self.items = items
+        self.items = tuple(items)
+        self.digest = None
+
+    def latex(self, resolver=None):
+        return render(self, resolver)
 
 class ListItem:
+    __slots__ = ("listType", "item", "indentation")
+
     def __init__(self, listType, item, indentation=0):
         self.listType = listType
-        self.item = item
+        self.item = tuple(map(tuple, item))
         self.indentation = indentation
 
+    def latex(self, resolver=None):
+        return render(self, resolver)
+
     def __repr__(self):
         return "%s - %s:%d" % (self.listType, self.item, self.indentation)
 
 
 class Table:
+    __slots__ = ("rows", "digest")
+
     def __init__(self, rows):
-        self.rows = rows
+        self.rows = tuple(rows)
+        self.digest = None
+
+    def latex(self, resolver=None):
+        return render(self, resolver)
 
 class TableCell:
+    __slots__ = ("content",)
+
     def __init__(self, content):
-        self.content = content
+        self.content = tuple(content)
+
+    def latex(self, resolver=None):
+        return render(self, resolver)
 
     def __repr__(self):
         text = [x.__repr__() for x in self.content]
@@ -306,8 +291,13 @@ class TableCell:
         return text
 
 class TableRow:
+    __slots__ = ("cells",)
+
     def __init__(self, cells):
-        self.cells = cells
+        self.cells = tuple(cells)
+
+    def latex(self, resolver=None):
+        return render(self, resolver)
 
     def __repr__(self):
         cell = [x.__repr__() for x in self.cells]
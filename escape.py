@@ -0,0 +1,55 @@
+import re
+
+# the chars LaTeX gives a meaning to
+SPECIALS = { "&": "\\&"
+           , "%": "\\%"
+           , "$": "\\$"
+           , "#": "\\#"
+           , "_": "\\_"
+           , "{": "\\{"
+           , "}": "\\}"
+           , "~": "\\textasciitilde{}"
+           , "^": "\\textasciicircum{}"
+           , "\\": "\\textbackslash{}"
+           }
+
+# common unicode that inputenc doesn't know, or that is safer as a command
+UNICODE = { "\u00a0": "~"
+          , "§": "\\S{}"
+          , "©": "\\textcopyright{}"
+          , "«": "\\guillemotleft{}"
+          , "®": "\\textregistered{}"
+          , "°": "\\textdegree{}"
+          , "±": "\\textpm{}"
+          , "¶": "\\P{}"
+          , "»": "\\guillemotright{}"
+          , "×": "\\texttimes{}"
+          , "÷": "\\textdiv{}"
+          , "\u200b": ""
+          , "–": "--"
+          , "—": "---"
+          , "‘": "`"
+          , "’": "'"
+          , "“": "``"
+          , "”": "''"
+          , "•": "\\textbullet{}"
+          , "…": "\\ldots{}"
+          , "€": "\\texteuro{}"
+          , "™": "\\texttrademark{}"
+          , "←": "\\textleftarrow{}"
+          , "→": "\\textrightarrow{}"
+          , "−": "\\textminus{}"
+          }
+
+TABLE = str.maketrans({ **SPECIALS, **UNICODE })
+
+# most text has none of them, and searching for one is a lot faster than
+# translating
+_escaped = re.compile("[%s]" % re.escape(''.join(map(chr, TABLE))))
+
+def escape(text):
+    """text with every LaTeX special, and the unicode in UNICODE, written
+    as LaTeX."""
+    if _escaped.search(text) is None:
+        return text
+    return text.translate(TABLE)
@@ -0,0 +1,245 @@
+import os
+import re
+import struct
+
+# what pdflatex includes as it is, anything else is converted to PNG
+INCLUDED = {".png", ".jpg", ".jpeg", ".pdf"}
+
+PDFBOX = re.compile(rb"/MediaBox\s*\[\s*([-\d.]+)\s+([-\d.]+)\s+([-\d.]+)"
+                    rb"\s+([-\d.]+)\s*\]")
+
+def jpeg(f):
+    """(width, height) from the first frame header of a JPEG, skipping from
+    segment to segment without reading what they hold."""
+    f.seek(2)
+    while True:
+        byte = f.read(1)
+        while byte and byte != b"\xff":
+            byte = f.read(1)
+        while byte == b"\xff":
+            byte = f.read(1)
+        if not byte:
+            return None
+        marker = byte[0]
+        if marker == 0x01 or 0xd0 <= marker <= 0xd9:
+            # standalone markers
+            continue
+        header = f.read(2)
+        if len(header) < 2:
+            return None
+        length = struct.unpack(">H", header)[0]
+        if 0xc0 <= marker <= 0xcf and marker not in (0xc4, 0xc8, 0xcc):
+            frame = f.read(5)
+            if len(frame) < 5:
+                return None
+            height, width = struct.unpack(">xHH", frame)
+            return (width, height)
+        f.seek(length - 2, os.SEEK_CUR)
+
+def dimensions(path):
+    """(width, height) of the image at path, in pixels or, for a PDF, in
+    points, read from its header alone. None if the format is unknown or
+    the header is broken."""
+    with open(path, "rb") as f:
+        head = f.read(32)
+        if head.startswith(b"\x89PNG\r\n\x1a\n") and head[12:16] == b"IHDR":
+            return struct.unpack(">II", head[16:24])
+        if head[:6] in (b"GIF87a", b"GIF89a"):
+            return struct.unpack("<HH", head[6:10])
+        if head.startswith(b"BM") and len(head) >= 26:
+            width, height = struct.unpack("<ii", head[18:26])
+            return (width, abs(height))
+        if head.startswith(b"\xff\xd8"):
+            return jpeg(f)
+        if head.startswith(b"%PDF"):
+            # the first page box is near the start in most files
+            m = PDFBOX.search(head + f.read(1 << 16))
+            if m:
+                x0, y0, x1, y1 = map(float, m.groups())
+                return (round(x1 - x0), round(y1 - y0))
+    return None
+
+def digest(path):
+    import hashlib
+    h = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(1 << 20)
+            if not block:
+                break
+            h.update(block)
+    return h.hexdigest()
+
+
+class Asset:
+    """What the pipeline found out about the image of a figure: the file it
+    resolves to, its size and dimensions, and the file to include, which
+    is a converted copy or thumbnail if it had to be made, or None if
+    there is nothing pdflatex can include. `error` says what went wrong,
+    if anything did."""
+
+    __slots__ = ("path", "file", "size", "dimensions", "include", "error")
+
+    def __init__(self, path, file=None, size=None, dimensions=None,
+                 include=None, error=None):
+        self.path = path
+        self.file = file
+        self.size = size
+        self.dimensions = dimensions
+        self.include = include
+        self.error = error
+
+    def __repr__(self):
+        return "Asset(%s, %s)" % (self.path, self.dimensions)
+
+
+class Figures:
+    """The images of a document, resolved against the directory base.
+
+    Paths are resolved, stat'ed and measured in a pool of threads as soon
+    as they are prefetched, so the renderer mostly finds them done.
+
+    Conversions and thumbnails are kept in the directory cache, named by a
+    hash of the content of the image they are made from, and made only
+    when they aren't there yet. An index in the cache maps the path, size
+    and mtime of an image to its hash, so unchanged images aren't even
+    read again on a rebuild. Making them needs Pillow; without a cache,
+    images are only checked and measured.
+    """
+
+    INDEX = "index.json"
+
+    def __init__(self, base=".", cache=None, thumbnails=None, jobs=None):
+        self.base = base
+        self.cache = cache
+        # include thumbnails no bigger than this many pixels
+        self.thumbnails = thumbnails
+        self.jobs = jobs
+        # started with the first figure, most documents have none
+        self.pool = None
+        self.lock = None
+        self.futures = {}
+        self.index = {}
+        self.made = 0
+        self.reused = 0
+        if cache:
+            import json
+            os.makedirs(cache, exist_ok=True)
+            try:
+                with open(os.path.join(cache, Figures.INDEX)) as f:
+                    self.index = json.load(f)
+            except (OSError, ValueError):
+                pass
+
+    def prefetch(self, blocks):
+        """Start resolving the figures among blocks."""
+        for block in blocks:
+            if type(block).__name__ == "Figure":
+                self.submit(block.path)
+
+    def submit(self, path):
+        future = self.futures.get(path)
+        if future is None:
+            if self.pool is None:
+                import threading
+                from concurrent.futures import ThreadPoolExecutor
+                self.lock = threading.Lock()
+                self.pool = ThreadPoolExecutor(self.jobs or
+                                               min(32, (os.cpu_count() or 1)
+                                                   + 4))
+            future = self.futures[path] = self.pool.submit(self.resolve, path)
+        return future
+
+    def get(self, path):
+        return self.submit(path).result()
+
+    def resolve(self, path):
+        file = os.path.abspath(os.path.join(self.base, path))
+        try:
+            st = os.stat(file)
+        except OSError:
+            return Asset(path, error="Figure '%s' not found" % path)
+        try:
+            dims = dimensions(file)
+        except OSError as e:
+            return Asset(path, file, st.st_size,
+                         error="Figure '%s' unreadable: %s" % (path, e))
+        ext = os.path.splitext(file)[1].lower()
+        asset = Asset(path, file, st.st_size, dims,
+                      path if ext in INCLUDED else None)
+        thumbnail = self.thumbnails and ext != ".pdf" and dims \
+                and max(dims) > self.thumbnails
+        if ext in INCLUDED and not thumbnail:
+            return asset
+        if not self.cache:
+            if ext not in INCLUDED:
+                asset.error = "Figure '%s' has to be converted, give " \
+                              "--assets" % path
+            return asset
+        try:
+            self.make(asset, st, thumbnail)
+        except Exception as e:
+            asset.error = "Figure '%s' not converted: %s" % (path, e)
+        return asset
+
+    def make(self, asset, st, thumbnail):
+        """Point asset.include to a PNG in the cache, made from its image
+        unless it's already there."""
+        key = "%d:%d" % (st.st_size, st.st_mtime_ns)
+        with self.lock:
+            entry = self.index.get(asset.file)
+        if entry and entry[0] == key:
+            h = entry[1]
+        else:
+            h = digest(asset.file)
+            with self.lock:
+                self.index[asset.file] = [key, h]
+        name = "%s-%d.png" % (h, self.thumbnails) if thumbnail \
+               else h + ".png"
+        out = os.path.abspath(os.path.join(self.cache, name))
+        if os.path.exists(out):
+            with self.lock:
+                self.reused += 1
+        else:
+            try:
+                from PIL import Image
+            except ImportError:
+                raise RuntimeError("converting images needs Pillow")
+            import tempfile
+            fd, tmp = tempfile.mkstemp(dir=self.cache, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f, Image.open(asset.file) as im:
+                    if thumbnail:
+                        im.thumbnail((self.thumbnails, self.thumbnails))
+                    im.save(f, "PNG")
+                os.replace(tmp, out)
+            except BaseException:
+                os.unlink(tmp)
+                raise
+            with self.lock:
+                self.made += 1
+        asset.include = out
+        if thumbnail:
+            scale = self.thumbnails / max(asset.dimensions)
+            asset.dimensions = tuple(max(1, round(d * scale))
+                                     for d in asset.dimensions)
+
+    def close(self):
+        """Wait for the pool and save the index."""
+        if self.pool is not None:
+            self.pool.shutdown()
+        if self.cache:
+            import json
+            import tempfile
+            fd, tmp = tempfile.mkstemp(dir=self.cache, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump(self.index, f)
+                os.replace(tmp, os.path.join(self.cache, Figures.INDEX))
+            except BaseException:
+                os.unlink(tmp)
+                raise
+
+    def report(self):
+        return "figures: %d resolved, %d made, %d reused from the cache\n" % \
+               (len(self.futures), self.made, self.reused)
@@ -0,0 +1,1330 @@
+# Generated by pgen.py from grammar.peg, don't edit.
+
+from lexer import tokenize
+
+from colors import NAMES
+from elements import Section
+from parser import (
+        format_bold,
+        format_cell,
+        format_color,
+        format_escape,
+        format_figure,
+        format_footnote,
+        format_footref,
+        format_inlinereference,
+        format_italic,
+        format_list,
+        format_listitem,
+        format_newline,
+        format_paragraph,
+        format_reference,
+        format_rgb,
+        format_row,
+        format_section,
+        format_str,
+        format_sublistitem,
+        format_table,
+        format_underline,
+        ishex,
+        isident,
+        isnormaltext,
+        ispathchar,
+        join
+)
+
+_FAIL = object()
+
+
+class NoParseError(Exception):
+    pass
+
+
+def run(tokens):
+    """Parse a source already split into tokens."""
+    r = _document(tokens, 0)
+    pos = r[1] if r else 0
+    if r is None or pos < len(tokens):
+        if pos < len(tokens):
+            raise NoParseError("got unexpected token: %r, expected: end of "
+                               "input" % (tokens[pos],))
+        raise NoParseError("got unexpected end of input")
+    return r[0]
+
+def parse(source):
+    """Parse a plastix source into a list of blocks."""
+    return run(tokenize(source))
+
+
+def _document(tokens, pos):
+    n = len(tokens)
+    v1 = []
+    while True:
+        p2 = pos
+        r = _block(tokens, pos)
+        if r is None:
+            break
+        v3, pos = r
+        v1.append(v3)
+    pos = p2
+    return (v1, pos)
+
+
+def _block(tokens, pos):
+    n = len(tokens)
+    p1 = pos
+    v2 = _FAIL
+    while True:
+        if pos >= n or tokens[pos] not in {'=', '==', '===', '====', '====='}:
+            break
+        r = _section(tokens, pos)
+        if r is None:
+            break
+        v3, pos = r
+        v2 = v3
+        break
+    if v2 is _FAIL:
+        pos = p1
+        while True:
+            if pos >= n or tokens[pos] != '#:':
+                break
+            r = _footnoteRef(tokens, pos)
+            if r is None:
+                break
+            v4, pos = r
+            v2 = v4
+            break
+    if v2 is _FAIL:
+        pos = p1
+        while True:
+            if pos >= n or tokens[pos] != '[':
+                break
+            r = _reference(tokens, pos)
+            if r is None:
+                break
+            v5, pos = r
+            v2 = v5
+            break
+    if v2 is _FAIL:
+        pos = p1
+        while True:
+            if pos >= n or tokens[pos] != '!':
+                break
+            r = _figure(tokens, pos)
+            if r is None:
+                break
+            v6, pos = r
+            v2 = v6
+            break
+    if v2 is _FAIL:
+        pos = p1
+        while True:
+            if pos >= n or tokens[pos] not in {'#', '*'}:
+                break
+            r = _lists(tokens, pos)
+            if r is None:
+                break
+            v7, pos = r
+            v2 = v7
+            break
+    if v2 is _FAIL:
+        pos = p1
+        while True:
+            r = _table(tokens, pos)
+            if r is None:
+                break
+            v8, pos = r
+            v2 = v8
+            break
+    if v2 is _FAIL:
+        pos = p1
+        while True:
+            r = _paragraph(tokens, pos)
+            if r is None:
+                break
+            v9, pos = r
+            v2 = v9
+            break
+    if v2 is _FAIL:
+        pos = p1
+        while True:
+            r = _newline(tokens, pos)
+            if r is None:
+                break
+            v10, pos = r
+            v2 = v10
+            break
+    if v2 is _FAIL:
+        return None
+    return (v2, pos)
+
+
+def _inline(tokens, pos):
+    n = len(tokens)
+    p1 = pos
+    v2 = _FAIL
+    while True:
+        r = _escapechar(tokens, pos)
+        if r is None:
+            break
+        v3, pos = r
+        v2 = v3
+        break
+    if v2 is _FAIL:
+        pos = p1
+        while True:
+            if pos >= n or tokens[pos] != '^#':
+                break
+            r = _footnote(tokens, pos)
+            if r is None:
+                break
+            v4, pos = r
+            v2 = v4
+            break
+    if v2 is _FAIL:
+        pos = p1
+        while True:
+            if pos >= n or tokens[pos] != '<':
+                break
+            r = _color(tokens, pos)
+            if r is None:
+                break
+            v5, pos = r
+            v2 = v5
+            break
+    if v2 is _FAIL:
+        pos = p1
+        while True:
+            if pos >= n or tokens[pos] != '*':
+                break
+            r = _bold(tokens, pos)
+            if r is None:
+                break
+            v6, pos = r
+            v2 = v6
+            break
+    if v2 is _FAIL:
+        pos = p1
+        while True:
+            if pos >= n or tokens[pos] != '//':
+                break
+            r = _italic(tokens, pos)
+            if r is None:
+                break
+            v7, pos = r
+            v2 = v7
+            break
+    if v2 is _FAIL:
+        pos = p1
+        while True:
+            if pos >= n or tokens[pos] != '[':
+                break
+            r = _inlinereference(tokens, pos)
+            if r is None:
+                break
+            v8, pos = r
+            v2 = v8
+            break
+    if v2 is _FAIL:
+        pos = p1
+        while True:
+            if pos >= n or tokens[pos] != '_':
+                break
+            r = _underline(tokens, pos)
+            if r is None:
+                break
+            v9, pos = r
+            v2 = v9
+            break
+    if v2 is _FAIL:
+        pos = p1
+        while True:
+            r = _text(tokens, pos)
+            if r is None:
+                break
+            v10, pos = r
+            v2 = v10
+            break
+    if v2 is _FAIL:
+        return None
+    return (v2, pos)
+
+
+def _inlines(tokens, pos):
+    n = len(tokens)
+    v1 = []
+    while True:
+        p2 = pos
+        r = _inline(tokens, pos)
+        if r is None:
+            break
+        v3, pos = r
+        v1.append(v3)
+    pos = p2
+    return (v1, pos)
+
+
+def _text(tokens, pos):
+    n = len(tokens)
+    if pos >= n:
+        return None
+    t = tokens[pos]
+    if not (isnormaltext(t[0]) and t[0] != '\n'):
+        return None
+    pos += 1
+    v1 = t
+    v2 = [v1]
+    while True:
+        p3 = pos
+        if pos >= n:
+            break
+        t = tokens[pos]
+        if not (isnormaltext(t[0]) and t[0] != '\n'):
+            break
+        pos += 1
+        v4 = t
+        v2.append(v4)
+    pos = p3
+    s = v2
+    v5 = format_str(s)
+    return (v5, pos)
+
+
+def _bold(tokens, pos):
+    n = len(tokens)
+    if pos >= n or tokens[pos] != '*':
+        return None
+    pos += 1
+    r = _inlines(tokens, pos)
+    if r is None:
+        return None
+    v1, pos = r
+    if pos >= n or tokens[pos] != '*':
+        return None
+    pos += 1
+    s = v1
+    v2 = format_bold(s)
+    return (v2, pos)
+
+
+def _italic(tokens, pos):
+    n = len(tokens)
+    if pos >= n or tokens[pos] != '//':
+        return None
+    pos += 1
+    r = _inlines(tokens, pos)
+    if r is None:
+        return None
+    v1, pos = r
+    if pos >= n or tokens[pos] != '//':
+        return None
+    pos += 1
+    s = v1
+    v2 = format_italic(s)
+    return (v2, pos)
+
+
+def _underline(tokens, pos):
+    n = len(tokens)
+    if pos >= n or tokens[pos] != '_':
+        return None
+    pos += 1
+    r = _inlines(tokens, pos)
+    if r is None:
+        return None
+    v1, pos = r
+    if pos >= n or tokens[pos] != '_':
+        return None
+    pos += 1
+    s = v1
+    v2 = format_underline(s)
+    return (v2, pos)
+
+
+def _color(tokens, pos):
+    n = len(tokens)
+    if pos >= n or tokens[pos] != '<':
+        return None
+    pos += 1
+    r = _inlines(tokens, pos)
+    if r is None:
+        return None
+    v1, pos = r
+    if pos >= n or tokens[pos] != ':':
+        return None
+    pos += 1
+    r = _colorDef(tokens, pos)
+    if r is None:
+        return None
+    v2, pos = r
+    if pos >= n or tokens[pos] != '>':
+        return None
+    pos += 1
+    v3 = (v1, v2)
+    s = v3
+    v4 = format_color(s)
+    return (v4, pos)
+
+
+def _colorDef(tokens, pos):
+    n = len(tokens)
+    p1 = pos
+    v2 = _FAIL
+    while True:
+        if pos >= n or tokens[pos] != '#':
+            break
+        if pos >= n or tokens[pos] != '#':
+            break
+        pos += 1
+        if pos >= n:
+            break
+        t = tokens[pos]
+        if not (len(t) == 6 and all(map(ishex, t))):
+            break
+        pos += 1
+        v3 = t
+        v4 = ('#', v3)
+        s = v4
+        v5 = join(s)
+        v2 = v5
+        break
+    if v2 is _FAIL:
+        pos = p1
+        while True:
+            if pos >= n:
+                break
+            t = tokens[pos]
+            if not (t in NAMES):
+                break
+            pos += 1
+            v6 = t
+            v2 = v6
+            break
+    if v2 is _FAIL:
+        pos = p1
+        while True:
+            if pos >= n or tokens[pos] != '(':
+                break
+            if pos >= n or tokens[pos] != '(':
+                break
+            pos += 1
+            r = _byteInt(tokens, pos)
+            if r is None:
+                break
+            v7, pos = r
+            if pos >= n or tokens[pos] != ',':
+                break
+            pos += 1
+            r = _byteInt(tokens, pos)
+            if r is None:
+                break
+            v8, pos = r
+            if pos >= n or tokens[pos] != ',':
+                break
+            pos += 1
+            r = _byteInt(tokens, pos)
+            if r is None:
+                break
+            v9, pos = r
+            if pos >= n or tokens[pos] != ')':
+                break
+            pos += 1
+            v10 = (v7, v8, v9)
+            s = v10
+            v11 = format_rgb(s)
+            v2 = v11
+            break
+    if v2 is _FAIL:
+        return None
+    return (v2, pos)
+
+
+def _byteInt(tokens, pos):
+    n = len(tokens)
+    if pos >= n:
+        return None
+    t = tokens[pos]
+    if not (t.isdigit()):
+        return None
+    pos += 1
+    v1 = t
+    v2 = [v1]
+    while True:
+        p3 = pos
+        if pos >= n:
+            break
+        t = tokens[pos]
+        if not (t.isdigit()):
+            break
+        pos += 1
+        v4 = t
+        v2.append(v4)
+    pos = p3
+    return (v2, pos)
+
+
+def _inlinereference(tokens, pos):
+    n = len(tokens)
+    if pos >= n or tokens[pos] != '[':
+        return None
+    pos += 1
+    r = _ident(tokens, pos)
+    if r is None:
+        return None
+    v1, pos = r
+    if pos >= n or tokens[pos] != ']':
+        return None
+    pos += 1
+    s = v1
+    v2 = format_inlinereference(s)
+    return (v2, pos)
+
+
+def _footnote(tokens, pos):
+    n = len(tokens)
+    if pos >= n or tokens[pos] != '^#':
+        return None
+    pos += 1
+    s = None
+    v1 = format_footnote(s)
+    return (v1, pos)
+
+
+def _escapechar(tokens, pos):
+    n = len(tokens)
+    if pos >= n:
+        return None
+    t = tokens[pos]
+    if not (len(t) == 2 and t[0] == '\\'):
+        return None
+    pos += 1
+    v1 = t
+    s = v1
+    v2 = format_escape(s[1])
+    return (v2, pos)
+
+
+def _ident(tokens, pos):
+    n = len(tokens)
+    v1 = []
+    while True:
+        p2 = pos
+        if pos >= n:
+            break
+        t = tokens[pos]
+        if not (all(map(isident, t))):
+            break
+        pos += 1
+        v3 = t
+        v1.append(v3)
+    pos = p2
+    s = v1
+    v4 = join(s)
+    return (v4, pos)
+
+
+def _spaces(tokens, pos):
+    n = len(tokens)
+    v1 = []
+    while True:
+        p2 = pos
+        if pos >= n:
+            break
+        t = tokens[pos]
+        if not (t[0] == ' '):
+            break
+        pos += 1
+        v1.append(None)
+    pos = p2
+    return (v1, pos)
+
+
+def _newline(tokens, pos):
+    n = len(tokens)
+    if pos >= n:
+        return None
+    t = tokens[pos]
+    if not (t[0] == '\n'):
+        return None
+    pos += 1
+    v1 = t
+    v2 = [v1]
+    while True:
+        p3 = pos
+        if pos >= n:
+            break
+        t = tokens[pos]
+        if not (t[0] == '\n'):
+            break
+        pos += 1
+        v4 = t
+        v2.append(v4)
+    pos = p3
+    s = v2
+    v5 = format_newline(s)
+    return (v5, pos)
+
+
+def _endline(tokens, pos):
+    n = len(tokens)
+    p1 = pos
+    v2 = _FAIL
+    while True:
+        if pos >= n or tokens[pos] != '\n':
+            break
+        if pos >= n or tokens[pos] != '\n':
+            break
+        pos += 1
+        v2 = '\n'
+        break
+    if v2 is _FAIL:
+        pos = p1
+        while True:
+            if pos < n:
+                break
+            v2 = None
+            break
+    if v2 is _FAIL:
+        return None
+    return (None, pos)
+
+
+def _line(tokens, pos):
+    n = len(tokens)
+    r = _inline(tokens, pos)
+    if r is None:
+        return None
+    v1, pos = r
+    v2 = [v1]
+    while True:
+        p3 = pos
+        r = _inline(tokens, pos)
+        if r is None:
+            break
+        v4, pos = r
+        v2.append(v4)
+    pos = p3
+    r = _endline(tokens, pos)
+    if r is None:
+        return None
+    v5, pos = r
+    return (v2, pos)
+
+
+def _section(tokens, pos):
+    n = len(tokens)
+    p1 = pos
+    v2 = _FAIL
+    while True:
+        if pos >= n or tokens[pos] != '=====':
+            break
+        if pos >= n or tokens[pos] != '=====':
+            break
+        pos += 1
+        r = _spaces(tokens, pos)
+        if r is None:
+            break
+        v3, pos = r
+        r = _line(tokens, pos)
+        if r is None:
+            break
+        v4, pos = r
+        v5 = (v3, v4)
+        s = v5
+        v6 = format_section(s, 5)
+        v2 = v6
+        break
+    if v2 is _FAIL:
+        pos = p1
+        while True:
+            if pos >= n or tokens[pos] != '=====':
+                break
+            if pos >= n or tokens[pos] != '=====':
+                break
+            pos += 1
+            r = _equalsLine(tokens, pos)
+            if r is None:
+                break
+            v7, pos = r
+            s = v7
+            v8 = Section(s, 4)
+            v2 = v8
+            break
+    if v2 is _FAIL:
+        pos = p1
+        while True:
+            if pos >= n or tokens[pos] != '====':
+                break
+            if pos >= n or tokens[pos] != '====':
+                break
+            pos += 1
+            r = _spaces(tokens, pos)
+            if r is None:
+                break
+            v9, pos = r
+            r = _line(tokens, pos)
+            if r is None:
+                break
+            v10, pos = r
+            v11 = (v9, v10)
+            s = v11
+            v12 = format_section(s, 4)
+            v2 = v12
+            break
+    if v2 is _FAIL:
+        pos = p1
+        while True:
+            if pos >= n or tokens[pos] != '====':
+                break
+            if pos >= n or tokens[pos] != '====':
+                break
+            pos += 1
+            r = _equalsLine(tokens, pos)
+            if r is None:
+                break
+            v13, pos = r
+            s = v13
+            v14 = Section(s, 3)
+            v2 = v14
+            break
+    if v2 is _FAIL:
+        pos = p1
+        while True:
+            if pos >= n or tokens[pos] != '===':
+                break
+            if pos >= n or tokens[pos] != '===':
+                break
+            pos += 1
+            r = _spaces(tokens, pos)
+            if r is None:
+                break
+            v15, pos = r
+            r = _line(tokens, pos)
+            if r is None:
+                break
+            v16, pos = r
+            v17 = (v15, v16)
+            s = v17
+            v18 = format_section(s, 3)
+            v2 = v18
+            break
+    if v2 is _FAIL:
+        pos = p1
+        while True:
+            if pos >= n or tokens[pos] != '===':
+                break
+            if pos >= n or tokens[pos] != '===':
+                break
+            pos += 1
+            r = _equalsLine(tokens, pos)
+            if r is None:
+                break
+            v19, pos = r
+            s = v19
+            v20 = Section(s, 2)
+            v2 = v20
+            break
+    if v2 is _FAIL:
+        pos = p1
+        while True:
+            if pos >= n or tokens[pos] != '==':
+                break
+            if pos >= n or tokens[pos] != '==':
+                break
+            pos += 1
+            r = _spaces(tokens, pos)
+            if r is None:
+                break
+            v21, pos = r
+            r = _line(tokens, pos)
+            if r is None:
+                break
+            v22, pos = r
+            v23 = (v21, v22)
+            s = v23
+            v24 = format_section(s, 2)
+            v2 = v24
+            break
+    if v2 is _FAIL:
+        pos = p1
+        while True:
+            if pos >= n or tokens[pos] != '==':
+                break
+            if pos >= n or tokens[pos] != '==':
+                break
+            pos += 1
+            r = _equalsLine(tokens, pos)
+            if r is None:
+                break
+            v25, pos = r
+            s = v25
+            v26 = Section(s, 1)
+            v2 = v26
+            break
+    if v2 is _FAIL:
+        pos = p1
+        while True:
+            if pos >= n or tokens[pos] != '=':
+                break
+            if pos >= n or tokens[pos] != '=':
+                break
+            pos += 1
+            r = _spaces(tokens, pos)
+            if r is None:
+                break
+            v27, pos = r
+            r = _line(tokens, pos)
+            if r is None:
+                break
+            v28, pos = r
+            v29 = (v27, v28)
+            s = v29
+            v30 = format_section(s, 1)
+            v2 = v30
+            break
+    if v2 is _FAIL:
+        return None
+    return (v2, pos)
+
+
+def _equalsLine(tokens, pos):
+    n = len(tokens)
+    v1 = []
+    while True:
+        p2 = pos
+        if pos >= n:
+            break
+        t = tokens[pos]
+        if not (isnormaltext(t[0]) and t[0] != '\n'):
+            break
+        pos += 1
+        v3 = t
+        v1.append(v3)
+    pos = p2
+    v4 = []
+    while True:
+        p5 = pos
+        r = _inline(tokens, pos)
+        if r is None:
+            break
+        v6, pos = r
+        v4.append(v6)
+    pos = p5
+    r = _endline(tokens, pos)
+    if r is None:
+        return None
+    v7, pos = r
+    v8 = (v1, v4)
+    s = v8
+    v9 = [format_str('=' + ''.join(s[0]))] + s[1]
+    return (v9, pos)
+
+
+def _footnoteRef(tokens, pos):
+    n = len(tokens)
+    if pos >= n or tokens[pos] != '#:':
+        return None
+    pos += 1
+    r = _spaces(tokens, pos)
+    if r is None:
+        return None
+    v1, pos = r
+    r = _inline(tokens, pos)
+    if r is None:
+        return None
+    v2, pos = r
+    v3 = [v2]
+    while True:
+        p4 = pos
+        r = _inline(tokens, pos)
+        if r is None:
+            break
+        v5, pos = r
+        v3.append(v5)
+    pos = p4
+    r = _endline(tokens, pos)
+    if r is None:
+        return None
+    v6, pos = r
+    v7 = (v1, v3)
+    s = v7
+    v8 = format_footref(s)
+    return (v8, pos)
+
+
+def _path(tokens, pos):
+    n = len(tokens)
+    if pos >= n:
+        return None
+    t = tokens[pos]
+    if not (all(map(ispathchar, t))):
+        return None
+    pos += 1
+    v1 = t
+    v2 = [v1]
+    while True:
+        p3 = pos
+        if pos >= n:
+            break
+        t = tokens[pos]
+        if not (all(map(ispathchar, t))):
+            break
+        pos += 1
+        v4 = t
+        v2.append(v4)
+    pos = p3
+    s = v2
+    v5 = join(s)
+    return (v5, pos)
+
+
+def _figure(tokens, pos):
+    n = len(tokens)
+    if pos >= n or tokens[pos] != '!':
+        return None
+    pos += 1
+    r = _path(tokens, pos)
+    if r is None:
+        return None
+    v1, pos = r
+    p2 = pos
+    v3 = None
+    while True:
+        r = _spaces(tokens, pos)
+        if r is None:
+            break
+        v4, pos = r
+        r = _ident(tokens, pos)
+        if r is None:
+            break
+        v5, pos = r
+        v6 = (v4, v5)
+        v3 = v6
+        p2 = pos
+        break
+    pos = p2
+    r = _endline(tokens, pos)
+    if r is None:
+        return None
+    v7, pos = r
+    p8 = pos
+    v9 = None
+    while True:
+        r = _line(tokens, pos)
+        if r is None:
+            break
+        v10, pos = r
+        v11 = [v10]
+        while True:
+            p12 = pos
+            r = _line(tokens, pos)
+            if r is None:
+                break
+            v13, pos = r
+            v11.append(v13)
+        pos = p12
+        v9 = v11
+        p8 = pos
+        break
+    pos = p8
+    v14 = (v1, v3, v9)
+    s = v14
+    v15 = format_figure(s)
+    return (v15, pos)
+
+
+def _paragraph(tokens, pos):
+    n = len(tokens)
+    r = _line(tokens, pos)
+    if r is None:
+        return None
+    v1, pos = r
+    v2 = [v1]
+    while True:
+        p3 = pos
+        r = _line(tokens, pos)
+        if r is None:
+            break
+        v4, pos = r
+        v2.append(v4)
+    pos = p3
+    p5 = pos
+    v6 = None
+    while True:
+        r = _newline(tokens, pos)
+        if r is None:
+            break
+        v7, pos = r
+        v6 = v7
+        p5 = pos
+        break
+    pos = p5
+    v8 = (v2, v6)
+    s = v8
+    v9 = format_paragraph(s)
+    return (v9, pos)
+
+
+def _listSubItem(tokens, pos):
+    n = len(tokens)
+    if pos >= n:
+        return None
+    t = tokens[pos]
+    if not (t[0] == ' '):
+        return None
+    pos += 1
+    v1 = t
+    v2 = [v1]
+    while True:
+        p3 = pos
+        if pos >= n:
+            break
+        t = tokens[pos]
+        if not (t[0] == ' '):
+            break
+        pos += 1
+        v4 = t
+        v2.append(v4)
+    pos = p3
+    if pos >= n:
+        return None
+    t = tokens[pos]
+    if not (t in ['#', '*']):
+        return None
+    pos += 1
+    v5 = t
+    if pos >= n or tokens[pos] != ' ':
+        return None
+    pos += 1
+    r = _line(tokens, pos)
+    if r is None:
+        return None
+    v6, pos = r
+    v7 = [v6]
+    while True:
+        p8 = pos
+        r = _line(tokens, pos)
+        if r is None:
+            break
+        v9, pos = r
+        v7.append(v9)
+    pos = p8
+    v10 = (v2, v5, v7)
+    s = v10
+    v11 = format_sublistitem(s)
+    return (v11, pos)
+
+
+def _orderedListItem(tokens, pos):
+    n = len(tokens)
+    if pos >= n or tokens[pos] != '#':
+        return None
+    pos += 1
+    if pos >= n or tokens[pos] != ' ':
+        return None
+    pos += 1
+    r = _line(tokens, pos)
+    if r is None:
+        return None
+    v1, pos = r
+    v2 = [v1]
+    while True:
+        p3 = pos
+        r = _line(tokens, pos)
+        if r is None:
+            break
+        v4, pos = r
+        v2.append(v4)
+    pos = p3
+    v5 = ('#', v2)
+    s = v5
+    v6 = format_listitem(s)
+    return (v6, pos)
+
+
+def _orderedList(tokens, pos):
+    n = len(tokens)
+    r = _orderedListItem(tokens, pos)
+    if r is None:
+        return None
+    v1, pos = r
+    v2 = []
+    while True:
+        p3 = pos
+        p4 = pos
+        v5 = _FAIL
+        while True:
+            if pos >= n or tokens[pos] != '#':
+                break
+            r = _orderedListItem(tokens, pos)
+            if r is None:
+                break
+            v6, pos = r
+            v5 = v6
+            break
+        if v5 is _FAIL:
+            pos = p4
+            while True:
+                r = _listSubItem(tokens, pos)
+                if r is None:
+                    break
+                v7, pos = r
+                v5 = v7
+                break
+        if v5 is _FAIL:
+            break
+        v2.append(v5)
+    pos = p3
+    v8 = (v1, v2)
+    s = v8
+    v9 = format_list(s)
+    return (v9, pos)
+
+
+def _unorderedListItem(tokens, pos):
+    n = len(tokens)
+    if pos >= n or tokens[pos] != '*':
+        return None
+    pos += 1
+    if pos >= n or tokens[pos] != ' ':
+        return None
+    pos += 1
+    r = _line(tokens, pos)
+    if r is None:
+        return None
+    v1, pos = r
+    v2 = [v1]
+    while True:
+        p3 = pos
+        r = _line(tokens, pos)
+        if r is None:
+            break
+        v4, pos = r
+        v2.append(v4)
+    pos = p3
+    v5 = ('*', v2)
+    s = v5
+    v6 = format_listitem(s)
+    return (v6, pos)
+
+
+def _unorderedList(tokens, pos):
+    n = len(tokens)
+    r = _unorderedListItem(tokens, pos)
+    if r is None:
+        return None
+    v1, pos = r
+    v2 = []
+    while True:
+        p3 = pos
+        p4 = pos
+        v5 = _FAIL
+        while True:
+            if pos >= n or tokens[pos] != '*':
+                break
+            r = _unorderedListItem(tokens, pos)
+            if r is None:
+                break
+            v6, pos = r
+            v5 = v6
+            break
+        if v5 is _FAIL:
+            pos = p4
+            while True:
+                r = _listSubItem(tokens, pos)
+                if r is None:
+                    break
+                v7, pos = r
+                v5 = v7
+                break
+        if v5 is _FAIL:
+            break
+        v2.append(v5)
+    pos = p3
+    v8 = (v1, v2)
+    s = v8
+    v9 = format_list(s)
+    return (v9, pos)
+
+
+def _lists(tokens, pos):
+    n = len(tokens)
+    p1 = pos
+    v2 = _FAIL
+    while True:
+        if pos >= n or tokens[pos] != '#':
+            break
+        r = _orderedList(tokens, pos)
+        if r is None:
+            break
+        v3, pos = r
+        v2 = v3
+        break
+    if v2 is _FAIL:
+        pos = p1
+        while True:
+            if pos >= n or tokens[pos] != '*':
+                break
+            r = _unorderedList(tokens, pos)
+            if r is None:
+                break
+            v4, pos = r
+            v2 = v4
+            break
+    if v2 is _FAIL:
+        return None
+    return (v2, pos)
+
+
+def _tableCell(tokens, pos):
+    n = len(tokens)
+    r = _inline(tokens, pos)
+    if r is None:
+        return None
+    v1, pos = r
+    v2 = [v1]
+    while True:
+        p3 = pos
+        r = _inline(tokens, pos)
+        if r is None:
+            break
+        v4, pos = r
+        v2.append(v4)
+    pos = p3
+    if pos >= n or tokens[pos] != '|':
+        return None
+    pos += 1
+    p5 = pos
+    v6 = None
+    while True:
+        r = _endline(tokens, pos)
+        if r is None:
+            break
+        v7, pos = r
+        v6 = v7
+        p5 = pos
+        break
+    pos = p5
+    v8 = (v2, v6)
+    s = v8
+    v9 = format_cell(s)
+    return (v9, pos)
+
+
+def _tableHLine(tokens, pos):
+    n = len(tokens)
+    if pos >= n:
+        return None
+    t = tokens[pos]
+    if not (t[0] == '-'):
+        return None
+    pos += 1
+    v1 = t
+    v2 = [v1]
+    while True:
+        p3 = pos
+        if pos >= n:
+            break
+        t = tokens[pos]
+        if not (t[0] == '-'):
+            break
+        pos += 1
+        v4 = t
+        v2.append(v4)
+    pos = p3
+    r = _endline(tokens, pos)
+    if r is None:
+        return None
+    v5, pos = r
+    return (v2, pos)
+
+
+def _tableRow(tokens, pos):
+    n = len(tokens)
+    if pos >= n or tokens[pos] != '|':
+        return None
+    pos += 1
+    r = _tableCell(tokens, pos)
+    if r is None:
+        return None
+    v1, pos = r
+    v2 = [v1]
+    while True:
+        p3 = pos
+        r = _tableCell(tokens, pos)
+        if r is None:
+            break
+        v4, pos = r
+        v2.append(v4)
+    pos = p3
+    r = _tableHLine(tokens, pos)
+    if r is None:
+        return None
+    v5, pos = r
+    v6 = (v2, v5)
+    s = v6
+    v7 = format_row(s)
+    return (v7, pos)
+
+
+def _table(tokens, pos):
+    n = len(tokens)
+    r = _tableHLine(tokens, pos)
+    if r is None:
+        return None
+    v1, pos = r
+    r = _tableRow(tokens, pos)
+    if r is None:
+        return None
+    v2, pos = r
+    v3 = [v2]
+    while True:
+        p4 = pos
+        r = _tableRow(tokens, pos)
+        if r is None:
+            break
+        v5, pos = r
+        v3.append(v5)
+    pos = p4
+    v6 = (v1, v3)
+    s = v6
+    v7 = format_table(s)
+    return (v7, pos)
+
+
+def _reference(tokens, pos):
+    n = len(tokens)
+    if pos >= n or tokens[pos] != '[':
+        return None
+    pos += 1
+    r = _ident(tokens, pos)
+    if r is None:
+        return None
+    v1, pos = r
+    if pos >= n or tokens[pos] != ']':
+        return None
+    pos += 1
+    if pos >= n or tokens[pos] != ':':
+        return None
+    pos += 1
+    r = _spaces(tokens, pos)
+    if r is None:
+        return None
+    v2, pos = r
+    r = _line(tokens, pos)
+    if r is None:
+        return None
+    v3, pos = r
+    v4 = [v3]
+    while True:
+        p5 = pos
+        r = _line(tokens, pos)
+        if r is None:
+            break
+        v6, pos = r
+        v4.append(v6)
+    pos = p5
+    v7 = (v1, v2, v4)
+    s = v7
+    v8 = format_reference(s)
+    return (v8, pos)
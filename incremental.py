@@ -0,0 +1,78 @@
+import hashlib
+import re
+
+from parser import parse
+
+# No block reaches over a blank line: lines end at their newline, and the
+# run of blank lines after a block is either kept by a paragraph or is a
+# newline block of its own. The source can therefore be cut right after
+# every run of blank lines and the pieces parsed on their own.
+boundary = re.compile(r"\n\n+")
+
+def split(source):
+    """Split a plastix source into chunks ending after a run of blank
+    lines. Joining the chunks gives back the source."""
+    start = 0
+    for m in boundary.finditer(source):
+        yield source[start:m.end()]
+        start = m.end()
+    if start < len(source):
+        yield source[start:]
+
+def digest(chunk):
+    return hashlib.blake2b(chunk.encode("utf-8"), digest_size=16).digest()
+
+
+class Incremental:
+    """Parse successive versions of a document, re-parsing only the chunks
+    that changed since the previous version.
+
+    The blocks of every chunk of the last version are kept, keyed by a hash
+    of the chunk. A chunk whose hash is known reuses its blocks, any other
+    chunk is parsed. Blocks that merge or split because blank lines were
+    added or removed end up in new chunks, so they are parsed again too.
+
+    With keep, the chunks of older versions (or other documents) are kept
+    too, up to keep chunks, dropping the least recently used first.
+    """
+
+    def __init__(self, lexed=True, keep=0):
+        self.lexed = lexed
+        self.keep = keep
+        self.chunks = {}
+        self.reused = 0
+        self.parsed = 0
+
+    def parse(self, source):
+        """Return the blocks of source, the same list parser.parse would
+        give, to be handed to Plastix."""
+        chunks = {}
+        blocks = []
+        self.reused = 0
+        self.parsed = 0
+        for chunk in split(source):
+            key = digest(chunk)
+            parsed = chunks.get(key)
+            if parsed is None:
+                parsed = self.chunks.get(key)
+                if parsed is None:
+                    parsed = parse(chunk, lexed=self.lexed)
+                    self.parsed += 1
+                else:
+                    self.reused += 1
+                chunks[key] = parsed
+            else:
+                self.reused += 1
+            blocks += parsed
+        if self.keep:
+            # dicts keep insertion order: move the chunks used last to the
+            # end and drop from the front
+            old = self.chunks
+            for key in chunks:
+                old.pop(key, None)
+            old.update(chunks)
+            while len(old) > self.keep:
+                del old[next(iter(old))]
+        else:
+            self.chunks = chunks
+        return blocks
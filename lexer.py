@@ -0,0 +1,57 @@
+import re
+
+import sys
+
+# Token kinds, tried in order at every position. Every character of a
+# plastix source is covered by exactly one of them, so joining the tokens
+# gives back the original input.
+#
+# Token boundaries are placed at every position where the character level
+# grammar makes a decision, which is what lets the same grammar run over
+# either representation and build the same AST:
+#
+# * a run of newlines is split into the single newline that ends a line
+#   and the run of blank lines after it.
+# * a run of spaces is split into its first space (the one after a list
+#   marker) and the rest of the run.
+# * section markers are cut into chunks of at most five `=`.
+# * an escape is a backslash together with the special it escapes.
+# * text never starts with a space, `=`, `!` or a bracket, but runs over
+#   them afterwards, they only matter at the start of a line or token.
+# * the path after `!`, and after every `/`, `:`, `_` and `-` in it, stops
+#   at the first space, where the label starts.
+# * the numbers of an rgb colour stop at `,` and `)`.
+TOKENS = [ ("escape", r"\\[*/<>:^#|\-_\\\[\]]")
+         , ("newlines", r"(?<=\n)\n+")
+         , ("newline", r"\n")
+         , ("spaces", r"(?<= ) +")
+         , ("space", r" ")
+         , ("section", r"={1,5}")
+         , ("italic", r"//")
+         , ("footnote", r"\^#")
+         , ("footref", r"#:")
+         , ("hline", r"-+")
+         , ("special", r"[*/<>:^#|_\\\[\]!(),]")
+         , ("path", r"(?<=[!/:_-])[^ \n*/<>:^#|\-_\\\[\]]+")
+         , ("number", r"(?<=[(,])\d+")
+         , ("text", r"[^\n*/<>:^#|\-_\\\[\]]+")
+         ]
+
+_typed = re.compile('|'.join("(?P<%s>%s)" % t for t in TOKENS))
+_plain = re.compile('|'.join("(?:%s)" % t for _, t in TOKENS))
+
+def tokenize(source, start=0, end=sys.maxsize):
+    """Split a plastix source into the list of token strings the lexed
+    grammar in parser.py runs over. Only source[start:end] is lexed, without
+    copying it, but the lexer still sees the char before start."""
+    return _plain.findall(source, start, end)
+
+def tokens(source):
+    """Yield (kind, value) pairs for every token in source."""
+    for m in _typed.finditer(source):
+        yield (m.lastgroup, m.group())
+
+if __name__ == "__main__":
+    with open(sys.argv[1], "r") as f:
+        for kind, value in tokens(f.read()):
+            print("%-9s %r" % (kind, value))
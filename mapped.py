@@ -0,0 +1,86 @@
+import mmap
+import os
+
+from lexer import tokenize
+from parser import Grammar, grammar
+
+def segments(text):
+    """Yield (start, end) of every run of lines of text that aren't
+    comments, the lines load() keeps."""
+    start = 0
+    n = len(text)
+    while start < n:
+        if text[start] == "%":
+            end = text.find("\n", start)
+            start = n if end < 0 else end + 1
+            continue
+        end = text.find("\n%", start)
+        if end < 0:
+            yield (start, n)
+            return
+        yield (start, end + 1)
+        start = end + 1
+
+
+class Source:
+    """A plastix file, memory mapped and decoded in one go, with its
+    comment lines found but not cut out.
+
+    The lexer runs over the segments between comment lines in place, so
+    neither the lines nor the uncommented source are ever copied.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                    text = str(m, "utf-8")
+            else:
+                text = ""
+        if "\r" in text:
+            # universal newlines, as open() in text mode
+            text = text.replace("\r\n", "\n").replace("\r", "\n")
+        self.source = text
+        self.segments = list(segments(text))
+
+    def text(self):
+        """The source without its comment lines, what load() returns."""
+        if len(self.segments) == 1:
+            start, end = self.segments[0]
+            if start == 0 and end == len(self.source):
+                return self.source
+        return ''.join(self.source[s:e] for s, e in self.segments)
+
+    def tokens(self):
+        """lexer.tokenize(self.text()), lexing the segments in place."""
+        out = []
+        for start, end in self.segments:
+            split = tokenize(self.source, start, end)
+            # A run of newlines is lexed as the newline ending a line and
+            # the blank lines after it. A run can go on from one segment to
+            # the next, and the lexer sees the newline before a segment
+            # where the uncommented source may have none, so runs at the edges
+            # are split again.
+            run = 0
+            while out and out[-1][0] == "\n":
+                run += len(out.pop())
+            first = 0
+            while first < len(split) and split[first][0] == "\n":
+                run += len(split[first])
+                first += 1
+            if run:
+                out.append("\n")
+                if run > 1:
+                    out.append("\n" * (run - 1))
+            out += split[first:] if first else split
+        return out
+
+    def parse(self, lexed=True, memo=None, profile=None):
+        """parser.parse(self.text(), lexed, memo, profile)."""
+        if memo is not None or profile is not None:
+            g = Grammar(lexed, memo, profile)
+        else:
+            g = grammar(lexed)
+        if lexed:
+            return g.run(self.tokens())
+        return g.run(list(self.text()))
@@ -0,0 +1,71 @@
+import funcparserlib.parser as p
+
+
+class Memo:
+    """Packrat memo table for one parse at a time.
+
+    Results of the memoized productions are stored per position, both
+    successes and failures, so a production is run at most once per
+    position. Only the last `window` positions are kept: backtracking never
+    goes further back than the start of the current block, so older
+    positions can be dropped to keep memory bounded on large inputs.
+    """
+
+    def __init__(self, window=4096):
+        self.window = window
+        self.table = {}
+        self.hits = {}
+        self.misses = {}
+        self.evictions = 0
+
+    def clear(self):
+        self.table = {}
+
+    def memoize(self, name, parser):
+        self.hits[name] = 0
+        self.misses[name] = 0
+
+        @p.Parser
+        def _memo(tokens, s):
+            table = self.table
+            results = table.get(s.pos)
+            if results is None:
+                results = table[s.pos] = {}
+                if len(table) > self.window:
+                    del table[next(iter(table))]
+                    self.evictions += 1
+            elif name in results:
+                self.hits[name] += 1
+                ok, value, state = results[name]
+                state = p.State(state.pos, max(s.max, state.max), state.parser)
+                if ok:
+                    return value, state
+                raise p.NoParseError(value, state)
+
+            self.misses[name] += 1
+            try:
+                value, s2 = parser.run(tokens, s)
+            except p.NoParseError as e:
+                results[name] = (False, e.msg, e.state)
+                raise
+            results[name] = (True, value, s2)
+            return value, s2
+
+        return _memo.named(name)
+
+    def hitrate(self, name=None):
+        names = [name] if name else list(self.hits)
+        hits = sum(self.hits[n] for n in names)
+        total = hits + sum(self.misses[n] for n in names)
+        return hits / total if total else 0.0
+
+    def report(self):
+        lines = []
+        for name in self.hits:
+            lines.append("%-8s %8d hits %8d misses %6.1f%%\n" %
+                    (name, self.hits[name], self.misses[name],
+                     100 * self.hitrate(name)))
+        lines.append("%-8s %8d hits %8d misses %6.1f%% (%d evicted)\n" %
+                ("total", sum(self.hits.values()), sum(self.misses.values()),
+                 100 * self.hitrate(), self.evictions))
+        return ''.join(lines)
@@ -0,0 +1,39 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from incremental import split
+from parser import parse as serial
+
+# batches per worker: more balance the load, fewer ship less
+BATCHES = 4
+
+def batches(source, n):
+    """Cut source into about n pieces of about the same size, at the chunk
+    boundaries of incremental.split, so every piece parses on its own."""
+    size = len(source) // n + 1
+    piece = []
+    length = 0
+    for chunk in split(source):
+        piece.append(chunk)
+        length += len(chunk)
+        if length >= size:
+            yield ''.join(piece)
+            piece = []
+            length = 0
+    if piece:
+        yield ''.join(piece)
+
+def parse(source, lexed=True, jobs=None, pool=None):
+    """Parse source in a pool of jobs processes, or in pool if given.
+    Returns the same blocks as parser.parse."""
+    jobs = jobs or os.cpu_count()
+    pieces = list(batches(source, jobs * BATCHES))
+    if len(pieces) < 2:
+        return serial(source, lexed=lexed)
+    if pool is None:
+        with ProcessPoolExecutor(jobs) as pool:
+            return parse(source, lexed, jobs, pool)
+    blocks = []
+    for parsed in pool.map(serial, pieces, [lexed] * len(pieces)):
+        blocks += parsed
+    return blocks
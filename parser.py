@@ -1,14 +1,15 @@
-import funcparserlib.parser as p
 from functools import reduce
 
 import sys
 
+from colors import NAMES
+from lexer import tokenize
+
 from elements import (
         Paragraph,
         Section,
         FootnoteRef,
         Reference,
-        String,
         Bold,
         Italic,
         Underline,
@@ -53,7 +54,9 @@ def format_reference(s):
     return Reference(ident, ref)
 
 def format_str(s):
-    return String(''.join(s))
+    # a text run is a plain str among the inlines; the same words and
+    # separators come back all over a document
+    return sys.intern(''.join(s))
 
 def format_footnote(s):
     return Footnote()
@@ -75,7 +78,7 @@ def format_underline(s):
     return Underline(s)
 
 def format_rgb(s):
-    print(s)
+    return tuple(int(''.join(c)) for c in s)
 
 def format_color(s):
     text, color = s
@@ -90,7 +93,7 @@ def format_figure(s):
 # ordered list
 def format_sublistitem(s):
     indent, listType, item = s
-    return ListItem(listType, item, len(indent))
+    return ListItem(listType, item, len(''.join(indent)))
 
 def format_listitem(s):
     listTupe, item = s
@@ -117,7 +120,6 @@ def format_row(r):
     return TableRow(row)
 
 def format_newline(s):
-    print(s)
     return Newline(''.join(s))
 
 def format_paragraph(s):
@@ -128,17 +130,9 @@ def format_inlinereference(s):
     return InlineRef(s)
 
 
-# helper parsers
-char = lambda c: p.skip(p.a(c))
-literal = lambda s: reduce(lambda x,y: x+y, map(char, s))
-var = lambda s: reduce(lambda x,y: x+y, map(lambda c: p.a(c), s))
-
 # simple char-list -> string shortcut
 join = (lambda s: ''.join(s))
 
-# discard spaces
-spaces = p.many(char(' '))
-
 # check if char matches a valid ident char [a-z0-9_:-]
 def isident(c):
     return c.isdigit() or ('a' <= c and c <= 'z') or c in (':', '_', '-')
@@ -165,7 +159,8 @@ def ishex(c):
 def ispathchar(c):
     return c.isalpha() or c.isdigit() or isident(c) or c in ('/', '.')
 
-def validescapechar(c):
+# chars that can be escaped inside the given emphasis
+def validescapechar(c, state=None):
     if not state:
         return False
     if state == "bold":
@@ -178,157 +173,291 @@ def validescapechar(c):
 def notSpace(c):
     return c not in [' ', '\t']
 
-ident = p.many(p.some(isident)) >> join
-
-text = p.oneplus(p.some(lambda c: isnormaltext(c) and c != '\n')) >> format_str
-
-# inlineCodeChar = p.many(p.some(lambda c: c not in ('`')))
-
-# code = char('`') + inlineCodeChar + char('`') >> format_inlinecode
-
-inline = p.forward_decl()
-
-# bold
-bold = char('*') + p.many(inline) + char('*') >> format_bold
-
-# italic
-italic = literal('//') + p.many(inline) + literal('//') >> format_italic
-
-underline = char('_') + p.many(inline) + char('_') >> format_underline
-
-# inline math
-# TODO inline math
-# inlineMath = char('$') + p.many(inline) + char('$')
-
-# color
-hexVal = p.some(ishex)
-hexColor = p.a('#') + hexVal + hexVal + hexVal + hexVal + hexVal + hexVal >> join
-# TODO better way to do this.
-strColor = var('red') >> join \
-         | var('blue') >> join
-# TODO doesn't handle ints that well
-byteInt = p.oneplus(p.some(lambda c: c.isdigit()))
-rgbColor = char('(') + byteInt + char(',') + \
-           byteInt + char(',') + byteInt + char(')') >> format_rgb
-colorDef = hexColor | strColor | rgbColor
-color = char('<') + p.many(inline) + char(':') + colorDef + char('>') \
-        >> format_color
-
-# reference
-inlinereference = char('[') + ident + literal(']') >> format_inlinereference
-
-# footnote
-footnote = literal('^#') >> format_footnote
-
-# rest = bold | color | italic | (p.some(lambda c: not isnormaltext(c)) >> (lambda s: print("rest:", s)))
-
-escapechar = char('\\') \
-           + p.some(lambda c: not isnormaltext(c)) \
-           >> format_escape
-
-inline.define(
-        escapechar
-      | footnote
-      | color
-      | bold
-      | italic
-      | inlinereference
-      | underline
-      | text)
-
-# print(inline.parse("*bold*")) # "<color*a*:red>"))
-
-newline = p.oneplus(p.a('\n')) >> format_newline
-
-endline = char('\n') | p.finished
-
-line = p.oneplus(inline) + endline
-
-section = literal('=====') + spaces + line >> \
-            (lambda s: format_section(s, 5)) \
-          | literal('====') + spaces + line >> \
-            (lambda s: format_section(s, 4)) \
-          | literal('===') + spaces + line >> \
-            (lambda s: format_section(s, 3)) \
-          | literal('==') + spaces + line >> \
-            (lambda s: format_section(s, 2)) \
-          | literal('=') + spaces + line >> \
-            (lambda s: format_section(s, 1)) \
-
-# footnote reference
-footnoteRef = literal('#:') + spaces + p.oneplus(inline) + endline >> format_footref
-
-# figure
-path = p.oneplus(p.some(ispathchar)) >> join # TODO handle paths
-optLabel = p.maybe(spaces + ident)
-optCaption = p.maybe(p.oneplus(line))
-# figure = literal('![') + path + char(']') + optLabel + endline + optCaption
-figure = char('!') + path + optLabel + endline + optCaption >> format_figure
-
-paragraph = p.oneplus(line) + p.maybe(newline) >> format_paragraph
-
-# # codeblock parsing
-# # any non-newline char can be in a codeblock
-# codeChar = p.many(p.some(lambda c: c != '\n'))
-# # code line
-# codeLine = literal('    ') + codeChar + endline >> format_codeline
-# # codeblock
-# codeBlock = p.oneplus(codeLine) >> format_code
-
-
-# general sublists
-listStart = p.some(lambda c: c in ['#', '*']) + char(' ')
-listSubItem = p.oneplus(p.some(lambda c: c == " ")) + \
-              listStart + p.oneplus(line) >> format_sublistitem
-
-# ordered lists
-orderedListItem = p.a('#') + char(' ') + p.oneplus(line) >> format_listitem
-orderedInlistItem =  orderedListItem | listSubItem
-
-orderedList = orderedListItem + p.many(orderedInlistItem) >> format_list
-
-# unordered lists
-unorderedListItem = p.a('*') + char(' ') + p.oneplus(line) >> format_listitem
-unorderedInlistItem =  unorderedListItem | listSubItem
-
-unorderedList = unorderedListItem + p.many(unorderedInlistItem) >> format_list
-
-lists = orderedList | unorderedList
-
-
-# tables
-tableCell = p.oneplus(inline) + char('|') + p.maybe(endline) >> format_cell
-tableHLine = p.oneplus(p.a('-')) + endline
-tableRow = char('|') + p.oneplus(tableCell) + tableHLine >> format_row
-
-table = tableHLine + p.oneplus(tableRow) >> format_table
-
-
-reference = char('[') + ident + literal(']:') + spaces + p.oneplus(line) \
-            >> format_reference
-
-block = section \
-      | footnoteRef \
-      | reference \
-      | figure \
-      | lists \
-      | table \
-      | paragraph \
-      | newline #| text#| codeBlock | paragraph
-
-document = p.many(block) + p.skip(p.finished)
+# lift a char predicate to tokens: every char must match
+def each(pred):
+    return lambda t: all(map(pred, t))
+
+# lift a char predicate to tokens: only the first char is looked at, which
+# is enough for tokens whose kind is decided by their first char
+def first(pred):
+    return lambda t: pred(t[0])
+
+
+class Grammar:
+    """The plastix grammar.
+
+    With lexed=False the grammar runs over the raw source, one char per
+    token. With lexed=True it runs over the output of lexer.tokenize, where
+    text, spaces, newlines and markers come as runs. Both build the same
+    AST for the same source.
+
+    Given a packrat.Memo, the block, line and inline productions (and the
+    inlines of bold, italic, underline and color) are memoized in it. Given
+    a profiling.Profile, every named production is counted in it.
+    """
+
+    def __init__(self, lexed=False, memo=None, profile=None):
+        # imported here, so the formatting functions can be imported
+        # without it, see generated.py
+        import funcparserlib.parser as p
+
+        self.lexed = lexed
+        self.memo = memo
+        memoize = memo.memoize if memo else (lambda name, parser: parser)
+        named = profile.wrap if profile else (lambda name, parser: parser)
+        split = tokenize if lexed else list
+        lift = each if lexed else (lambda pred: pred)
+        kind = first if lexed else (lambda pred: pred)
+
+        # helper parsers
+        char = lambda c: p.skip(p.a(c))
+        literal = lambda s: reduce(lambda x,y: x+y, map(char, split(s)))
+        var = lambda s: reduce(lambda x,y: x+y, map(lambda c: p.a(c), split(s)))
+
+        # discard spaces
+        spaces = p.many(p.skip(p.some(kind(lambda c: c == ' '))))
+
+        ident = p.many(p.some(lift(isident))) >> join
+
+        text = named("text",
+                p.oneplus(p.some(kind(lambda c: isnormaltext(c) and c != '\n')))
+                >> format_str)
+
+        # inlineCodeChar = p.many(p.some(lambda c: c not in ('`')))
+
+        # code = char('`') + inlineCodeChar + char('`') >> format_inlinecode
+
+        inline = p.forward_decl()
+        inlines = memoize("inlines", p.many(inline))
+
+        # bold
+        bold = named("bold", char('*') + inlines + char('*') >> format_bold)
+
+        # italic
+        italic = named("italic",
+                literal('//') + inlines + literal('//') >> format_italic)
+
+        underline = named("underline",
+                char('_') + inlines + char('_') >> format_underline)
+
+        # inline math
+        # TODO inline math
+        # inlineMath = char('$') + p.many(inline) + char('$')
+
+        # color
+        if lexed:
+            hexVal = p.some(lambda t: len(t) == 6 and all(map(ishex, t)))
+            hexColor = p.a('#') + hexVal >> join
+        else:
+            hexVal = p.some(ishex)
+            hexColor = p.a('#') + hexVal + hexVal + hexVal + hexVal + hexVal + hexVal >> join
+        # the CSS colour names. The char grammar tries the longest first, so
+        # a name isn't cut short by another one it starts with
+        if lexed:
+            strColor = p.some(lambda t: t in NAMES)
+        else:
+            strColor = reduce(lambda x,y: x | y,
+                    [ var(name) >> join
+                      for name in sorted(NAMES, key=len, reverse=True) ])
+        # TODO doesn't handle ints that well
+        byteInt = p.oneplus(p.some(lambda c: c.isdigit()))
+        rgbColor = char('(') + byteInt + char(',') + \
+                   byteInt + char(',') + byteInt + char(')') >> format_rgb
+        colorDef = hexColor | strColor | rgbColor
+        color = named("color",
+                char('<') + inlines + char(':') + colorDef + char('>')
+                >> format_color)
+
+        # reference
+        inlinereference = named("inlinereference",
+                char('[') + ident + literal(']') >> format_inlinereference)
+
+        # footnote
+        footnote = named("footnote", literal('^#') >> format_footnote)
+
+        # rest = bold | color | italic | (p.some(lambda c: not isnormaltext(c)) >> (lambda s: print("rest:", s)))
+
+        if lexed:
+            escapechar = p.some(lambda t: len(t) == 2 and t[0] == '\\') \
+                       >> (lambda t: format_escape(t[1]))
+        else:
+            escapechar = char('\\') \
+                       + p.some(lambda c: not isnormaltext(c)) \
+                       >> format_escape
+
+        escapechar = named("escapechar", escapechar)
+
+        inline.define(named("inline", memoize("inline",
+                escapechar
+              | footnote
+              | color
+              | bold
+              | italic
+              | inlinereference
+              | underline
+              | text)))
+
+        newline = named("newline",
+                p.oneplus(p.some(kind(lambda c: c == '\n'))) >> format_newline)
+
+        endline = p.skip(p.a('\n') | p.finished)
+
+        line = named("line", memoize("line", p.oneplus(inline) + endline))
+
+        if lexed:
+            # A run of n '=' is a level n section, unless the rest of the
+            # line doesn't parse. The char grammar then backtracks to a
+            # level n-1 section whose text starts with the last '='.
+            normal = p.some(first(lambda c: isnormaltext(c) and c != '\n'))
+            equalsLine = p.many(normal) + p.many(inline) + endline >> \
+                         (lambda s: [format_str('=' + ''.join(s[0]))] + s[1])
+            section = reduce(lambda x,y: x | y,
+                    [ literal('=' * n) + spaces + line >>
+                        (lambda s, n=n: format_section(s, n))
+                    | literal('=' * n) + equalsLine >>
+                        (lambda s, n=n: Section(s, n - 1))
+                      for n in range(5, 1, -1) ]) \
+                  | literal('=') + spaces + line >> \
+                    (lambda s: format_section(s, 1))
+        else:
+            section = literal('=====') + spaces + line >> \
+                        (lambda s: format_section(s, 5)) \
+                      | literal('====') + spaces + line >> \
+                        (lambda s: format_section(s, 4)) \
+                      | literal('===') + spaces + line >> \
+                        (lambda s: format_section(s, 3)) \
+                      | literal('==') + spaces + line >> \
+                        (lambda s: format_section(s, 2)) \
+                      | literal('=') + spaces + line >> \
+                        (lambda s: format_section(s, 1)) \
+
+        section = named("section", section)
+
+        # footnote reference
+        footnoteRef = named("footnoteRef",
+                literal('#:') + spaces + p.oneplus(inline) + endline >> format_footref)
+
+        # figure
+        path = p.oneplus(p.some(lift(ispathchar))) >> join # TODO handle paths
+        optLabel = p.maybe(spaces + ident)
+        optCaption = p.maybe(p.oneplus(line))
+        # figure = literal('![') + path + char(']') + optLabel + endline + optCaption
+        figure = named("figure",
+                char('!') + path + optLabel + endline + optCaption >> format_figure)
+
+        paragraph = named("paragraph",
+                p.oneplus(line) + p.maybe(newline) >> format_paragraph)
+
+        # # codeblock parsing
+        # # any non-newline char can be in a codeblock
+        # codeChar = p.many(p.some(lambda c: c != '\n'))
+        # # code line
+        # codeLine = literal('    ') + codeChar + endline >> format_codeline
+        # # codeblock
+        # codeBlock = p.oneplus(codeLine) >> format_code
+
+
+        # general sublists
+        listStart = p.some(lambda c: c in ['#', '*']) + char(' ')
+        listSubItem = p.oneplus(p.some(kind(lambda c: c == " "))) + \
+                      listStart + p.oneplus(line) >> format_sublistitem
+
+        # ordered lists
+        orderedListItem = p.a('#') + char(' ') + p.oneplus(line) >> format_listitem
+        orderedInlistItem =  orderedListItem | listSubItem
+
+        orderedList = orderedListItem + p.many(orderedInlistItem) >> format_list
+
+        # unordered lists
+        unorderedListItem = p.a('*') + char(' ') + p.oneplus(line) >> format_listitem
+        unorderedInlistItem =  unorderedListItem | listSubItem
+
+        unorderedList = unorderedListItem + p.many(unorderedInlistItem) >> format_list
+
+        lists = named("lists", orderedList | unorderedList)
+
+
+        # tables
+        tableCell = p.oneplus(inline) + char('|') + p.maybe(endline) >> format_cell
+        tableHLine = p.oneplus(p.some(kind(lambda c: c == '-'))) + endline
+        tableRow = char('|') + p.oneplus(tableCell) + tableHLine >> format_row
+
+        table = named("table", tableHLine + p.oneplus(tableRow) >> format_table)
+
+
+        reference = named("reference",
+                char('[') + ident + literal(']:') + spaces + p.oneplus(line)
+                >> format_reference)
+
+        block = named("block", memoize("block",
+                section
+              | footnoteRef
+              | reference
+              | figure
+              | lists
+              | table
+              | paragraph
+              | newline)) #| text#| codeBlock | paragraph
+
+        self.inline = inline
+        self.text = text
+        self.line = line
+        self.section = section
+        self.footnoteRef = footnoteRef
+        self.reference = reference
+        self.figure = figure
+        self.lists = lists
+        self.table = table
+        self.paragraph = paragraph
+        self.newline = newline
+        self.block = block
+        self.document = p.many(block) + p.skip(p.finished)
+
+    def parse(self, source):
+        if self.lexed:
+            source = tokenize(source)
+        return self.run(source)
+
+    def run(self, tokens):
+        """Parse a source already split into tokens, or chars for the char
+        level grammar."""
+        if self.memo:
+            self.memo.clear()
+        return self.document.parse(tokens)
+
+
+# The grammars are built on first use and kept, so importing this module
+# costs nothing but the imports and a run only builds the grammar it uses.
+_grammars = {}
+
+def grammar(lexed=True):
+    """The shared Grammar for lexed or char level parsing."""
+    g = _grammars.get(lexed)
+    if g is None:
+        g = _grammars.setdefault(lexed, Grammar(lexed))
+    return g
+
+def __getattr__(name):
+    # chars, tokens and document used to be built on import
+    if name == "chars":
+        return grammar(False)
+    if name == "tokens":
+        return grammar(True)
+    if name == "document":
+        return grammar(False).document
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+def parse(source, lexed=True, memo=None, profile=None):
+    """Parse a plastix source into a list of blocks. lexed=False selects
+    the old char level grammar, a packrat.Memo turns on memoization and a
+    profiling.Profile counts the productions."""
+    if memo is not None or profile is not None:
+        return Grammar(lexed, memo, profile).parse(source)
+    return grammar(lexed).parse(source)
 
 def load(path):
-    plastix = ""
-    with open(path, "r") as f:
-        # hacky way to handle comments
-        lines = f.readlines()
-        outlines = []
-        for line in lines:
-            if line[0] != "%":
-                outlines.append(line)
-        plastix = ''.join(outlines)
-    print(document.parse(plastix))
+    from mapped import Source
+    print(Source(path).parse())
 
 if __name__ == "__main__":
     load(sys.argv[1])
@@ -0,0 +1,551 @@
+import argparse
+import ast
+import sys
+
+# Compiles a grammar in the notation of grammar.peg to a Python module with
+# a function per rule. The functions take the token list and a position and
+# return the value and the position after it, or None if the rule doesn't
+# match there. Choices and repetitions are inlined in the rule functions and
+# every alternative of a choice is guarded by the set of tokens it can start
+# with, when that's known, so alternatives that can't match are never tried.
+
+class GrammarError(Exception):
+    pass
+
+
+# kinds of values, as funcparserlib builds them
+VALUE = "value"
+TUPLE = "tuple"
+# a tuple or None, from a? with a giving a tuple
+MAYBE = "maybe"
+# left out of a sequence
+SKIPPED = "skipped"
+
+def closing(text, i, close):
+    """Index after the `close` matching the bracket at text[i], skipping
+    over nested brackets and Python strings."""
+    opening = text[i]
+    depth = 0
+    while i < len(text):
+        c = text[i]
+        if c in ("'", '"'):
+            i = string(text, i)
+            continue
+        if c == opening:
+            depth += 1
+        elif c == close:
+            depth -= 1
+            if depth == 0:
+                return i + 1
+        i += 1
+    raise GrammarError("unclosed %r at line %d" % (opening, lineno(text, i)))
+
+def string(text, i):
+    """Index after the string literal starting at text[i]."""
+    quote = text[i]
+    i += 1
+    while i < len(text) and text[i] != quote:
+        i += 2 if text[i] == '\\' else 1
+    if i >= len(text):
+        raise GrammarError("unclosed string")
+    return i + 1
+
+def lineno(text, i):
+    return text.count('\n', 0, i) + 1
+
+def header(text):
+    """Split the import lines off text, leaving blank lines in their place.
+    Returns the imports and the rest."""
+    imports = []
+    lines = text.split('\n')
+    i = 0
+    while i < len(lines):
+        if lines[i].startswith(("from ", "import ")):
+            start = i
+            if '(' in lines[i]:
+                while ')' not in lines[i]:
+                    i += 1
+            imports += lines[start:i + 1]
+            lines[start:i + 1] = [""] * (i + 1 - start)
+        i += 1
+    return imports, '\n'.join(lines)
+
+def lex(text):
+    """Split a grammar into (kind, value, line) tokens."""
+    out = []
+    i = 0
+    while i < len(text):
+        c = text[i]
+        if c.isspace():
+            i += 1
+        elif c == '#':
+            end = text.find('\n', i)
+            i = len(text) if end < 0 else end
+        elif c in ("'", '"'):
+            end = string(text, i)
+            out.append(("lit", ast.literal_eval(text[i:end]), lineno(text, i)))
+            i = end
+        elif c == '[':
+            end = closing(text, i, ']')
+            out.append(("pred", text[i + 1:end - 1].strip(), lineno(text, i)))
+            i = end
+        elif c == '{':
+            end = closing(text, i, '}')
+            out.append(("action", ' '.join(text[i + 1:end - 1].split()),
+                        lineno(text, i)))
+            i = end
+        elif text.startswith("<-", i):
+            out.append(("<-", None, lineno(text, i)))
+            i += 2
+        elif c.isalpha() or c == '_':
+            end = i
+            while end < len(text) and (text[end].isalnum() or text[end] == '_'):
+                end += 1
+            out.append(("name", text[i:end], lineno(text, i)))
+            i = end
+        elif c in "()/*+?-$":
+            out.append((c, None, lineno(text, i)))
+            i += 1
+        else:
+            raise GrammarError("unexpected %r at line %d" %
+                               (c, lineno(text, i)))
+    return out
+
+
+class Reader:
+    """Reads the rules of a grammar from its tokens. Expressions are
+    tuples: ("lit", token), ("pred", code), ("end",), ("ref", name),
+    ("seq", items), ("choice", alternatives), ("many", e), ("oneplus", e),
+    ("maybe", e), ("skip", e) and ("action", e, code)."""
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.i = 0
+
+    def peek(self, offset=0):
+        if self.i + offset < len(self.tokens):
+            return self.tokens[self.i + offset][0]
+        return None
+
+    def next(self, kind):
+        if self.peek() != kind:
+            line = self.tokens[self.i][2] if self.peek() else "the end"
+            raise GrammarError("expected %s at line %s" % (kind, line))
+        self.i += 1
+        return self.tokens[self.i - 1][1]
+
+    def rules(self):
+        rules = {}
+        while self.peek():
+            name = self.next("name")
+            self.next("<-")
+            if name in rules:
+                raise GrammarError("rule %s defined twice" % name)
+            rules[name] = self.choice()
+        return rules
+
+    def choice(self):
+        alternatives = [self.sequence()]
+        while self.peek() == '/':
+            self.next('/')
+            alternatives.append(self.sequence())
+        if len(alternatives) == 1:
+            return alternatives[0]
+        return ("choice", alternatives)
+
+    def starts(self):
+        # the next token starts an item, and not the next rule
+        kind = self.peek()
+        if kind == "name":
+            return self.peek(1) != "<-"
+        return kind in ("lit", "pred", "$", "(", "-")
+
+    def sequence(self):
+        items = []
+        while self.starts():
+            items.append(self.prefix())
+        if not items:
+            line = self.tokens[self.i][2] if self.peek() else "the end"
+            raise GrammarError("expected an expression at line %s" % line)
+        e = items[0] if len(items) == 1 else ("seq", items)
+        if self.peek() == "action":
+            e = ("action", e, self.next("action"))
+        return e
+
+    def prefix(self):
+        if self.peek() == '-':
+            self.next('-')
+            return ("skip", self.prefix())
+        e = self.primary()
+        while self.peek() in ('*', '+', '?'):
+            op = self.peek()
+            self.next(op)
+            e = ({ '*': "many", '+': "oneplus", '?': "maybe" }[op], e)
+        return e
+
+    def primary(self):
+        kind = self.peek()
+        if kind == "lit":
+            return ("lit", self.next("lit"))
+        if kind == "pred":
+            return ("pred", self.next("pred"))
+        if kind == "name":
+            return ("ref", self.next("name"))
+        if kind == '$':
+            self.next('$')
+            return ("end",)
+        self.next('(')
+        e = self.choice()
+        self.next(')')
+        return e
+
+
+def fixpoint(rules, f, start):
+    """The values of f for every rule, f getting the values of the other
+    rules, computed from start until none changes."""
+    values = dict.fromkeys(rules, start)
+    changed = True
+    while changed:
+        changed = False
+        for name, e in rules.items():
+            value = f(e, values)
+            if value != values[name]:
+                values[name] = value
+                changed = True
+    return values
+
+def nullable(e, rules):
+    """Whether e can match without taking a token."""
+    kind = e[0]
+    if kind in ("lit", "pred"):
+        return False
+    if kind in ("end", "many", "maybe"):
+        return True
+    if kind == "ref":
+        return rules[e[1]]
+    if kind == "seq":
+        return all(nullable(item, rules) for item in e[1])
+    if kind == "choice":
+        return any(nullable(alt, rules) for alt in e[1])
+    return nullable(e[1], rules)
+
+def first(e, rules, empty):
+    """The set of tokens e can start with, or None if that isn't a fixed set
+    of tokens. empty is the nullable of every rule."""
+    kind = e[0]
+    if kind == "lit":
+        return frozenset([e[1]])
+    if kind in ("pred", "end", "many", "maybe"):
+        return None
+    if kind == "ref":
+        return rules[e[1]]
+    if kind == "seq":
+        if nullable(e[1][0], empty):
+            return None
+        return first(e[1][0], rules, empty)
+    if kind == "choice":
+        tokens = frozenset()
+        for alt in e[1]:
+            more = first(alt, rules, empty)
+            if more is None:
+                return None
+            tokens |= more
+        return tokens
+    return first(e[1], rules, empty)
+
+def kind(e, rules):
+    """The kind of value e gives."""
+    k = e[0]
+    if k in ("lit", "pred", "end", "many", "oneplus", "action"):
+        return VALUE
+    if k == "skip":
+        return SKIPPED
+    if k == "ref":
+        return rules[e[1]]
+    if k == "maybe":
+        return MAYBE if kind(e[1], rules) in (TUPLE, MAYBE) else VALUE
+    if k == "choice":
+        # a choice is never skipped, funcparserlib keeps the skipped value
+        kinds = set(kind(alt, rules) for alt in e[1]) - set((SKIPPED,))
+        if len(kinds) <= 1:
+            return kinds.pop() if kinds else VALUE
+        return MAYBE if kinds & set((TUPLE, MAYBE)) else VALUE
+    # a sequence
+    acc = None
+    for item in e[1]:
+        k = kind(item, rules)
+        if acc is None or acc == SKIPPED:
+            acc = k
+        elif k != SKIPPED:
+            acc = TUPLE
+    return acc
+
+
+class Emitter:
+    """Writes the function of a rule."""
+
+    def __init__(self, rules, kinds, firsts, empty):
+        self.rules = rules
+        self.kinds = kinds
+        self.firsts = firsts
+        self.empty = empty
+        self.lines = []
+        self.depth = 0
+        self.count = 0
+
+    def line(self, s):
+        self.lines.append("    " * self.depth + s)
+
+    def fresh(self, prefix):
+        self.count += 1
+        return "%s%d" % (prefix, self.count)
+
+    def rule(self, name):
+        self.count = 0
+        self.line("def _%s(tokens, pos):" % name)
+        self.depth += 1
+        self.line("n = len(tokens)")
+        value = self.emit(self.rules[name], "return None",
+                          self.kinds[name] != SKIPPED)
+        self.line("return (%s, pos)" % value)
+        self.depth -= 1
+        self.line("")
+        self.line("")
+
+    def emit(self, e, fail, want=True):
+        """Write the code matching e at pos, running the statement fail if
+        it doesn't match. Returns the expression of its value."""
+        return getattr(self, e[0])(e, fail, want)
+
+    def lit(self, e, fail, want):
+        self.line("if pos >= n or tokens[pos] != %r:" % e[1])
+        self.line("    " + fail)
+        self.line("pos += 1")
+        return repr(e[1])
+
+    def pred(self, e, fail, want):
+        self.line("if pos >= n:")
+        self.line("    " + fail)
+        self.line("t = tokens[pos]")
+        self.line("if not (%s):" % e[1])
+        self.line("    " + fail)
+        self.line("pos += 1")
+        if not want:
+            return "None"
+        v = self.fresh('v')
+        self.line("%s = t" % v)
+        return v
+
+    def end(self, e, fail, want):
+        self.line("if pos < n:")
+        self.line("    " + fail)
+        return "None"
+
+    def ref(self, e, fail, want):
+        v = self.fresh('v')
+        self.line("r = _%s(tokens, pos)" % e[1])
+        self.line("if r is None:")
+        self.line("    " + fail)
+        self.line("%s, pos = r" % v)
+        return v
+
+    def skip(self, e, fail, want):
+        self.emit(e[1], fail, False)
+        return "None"
+
+    def action(self, e, fail, want):
+        value = self.emit(e[1], fail)
+        v = self.fresh('v')
+        self.line("s = %s" % value)
+        self.line("%s = %s" % (v, e[2]))
+        return v
+
+    def seq(self, e, fail, want):
+        # funcparserlib's `+`: values make a flat tuple, the skipped ones
+        # left out, or stand alone if there is only one
+        acc = None
+        elements = None
+        for item in e[1]:
+            k = kind(item, self.kinds)
+            value = self.emit(item, fail, want and k != SKIPPED)
+            if acc is None or acc == SKIPPED:
+                acc, elements = k, value
+            elif k == SKIPPED:
+                pass
+            elif acc == MAYBE:
+                raise GrammarError("a tuple or None followed by a value")
+            elif acc == TUPLE:
+                if isinstance(elements, list):
+                    elements.append(value)
+                else:
+                    elements = "%s + (%s,)" % (elements, value)
+            else:
+                acc, elements = TUPLE, [elements, value]
+        if not want or acc == SKIPPED:
+            return "None"
+        if isinstance(elements, list):
+            v = self.fresh('v')
+            self.line("%s = (%s)" % (v, ', '.join(elements)))
+            return v
+        return elements
+
+    def guard(self, e, fail):
+        tokens = first(e, self.firsts, self.empty)
+        if tokens is None:
+            return
+        if len(tokens) == 1:
+            self.line("if pos >= n or tokens[pos] != %r:" % next(iter(tokens)))
+        else:
+            self.line("if pos >= n or tokens[pos] not in {%s}:" %
+                      ', '.join(map(repr, sorted(tokens))))
+        self.line("    " + fail)
+
+    def choice(self, e, fail, want):
+        start = self.fresh('p')
+        v = self.fresh('v')
+        self.line("%s = pos" % start)
+        self.line("%s = _FAIL" % v)
+        for i, alt in enumerate(e[1]):
+            if i:
+                self.line("if %s is _FAIL:" % v)
+                self.depth += 1
+                self.line("pos = %s" % start)
+            self.line("while True:")
+            self.depth += 1
+            self.guard(alt, "break")
+            value = self.emit(alt, "break", want)
+            self.line("%s = %s" % (v, value))
+            self.line("break")
+            self.depth -= 1
+            if i:
+                self.depth -= 1
+        self.line("if %s is _FAIL:" % v)
+        self.line("    " + fail)
+        return v
+
+    def repeat(self, e, v, want):
+        start = self.fresh('p')
+        self.line("while True:")
+        self.depth += 1
+        self.line("%s = pos" % start)
+        value = self.emit(e, "break", want)
+        if want:
+            self.line("%s.append(%s)" % (v, value))
+        self.depth -= 1
+        self.line("pos = %s" % start)
+
+    def many(self, e, fail, want):
+        if nullable(e[1], self.empty):
+            raise GrammarError("repetition of an expression matching nothing")
+        v = self.fresh('v')
+        self.line("%s = []" % v)
+        self.repeat(e[1], v, want)
+        return v
+
+    def oneplus(self, e, fail, want):
+        if nullable(e[1], self.empty):
+            raise GrammarError("repetition of an expression matching nothing")
+        value = self.emit(e[1], fail, want)
+        v = self.fresh('v')
+        self.line("%s = [%s]" % (v, value))
+        self.repeat(e[1], v, want)
+        return v
+
+    def maybe(self, e, fail, want):
+        start = self.fresh('p')
+        v = self.fresh('v')
+        self.line("%s = pos" % start)
+        self.line("%s = None" % v)
+        self.line("while True:")
+        self.depth += 1
+        value = self.emit(e[1], "break", want)
+        self.line("%s = %s" % (v, value))
+        self.line("%s = pos" % start)
+        self.line("break")
+        self.depth -= 1
+        self.line("pos = %s" % start)
+        return v
+
+
+PRELUDE = '''\
+# Generated by pgen.py from %s, don't edit.
+
+from lexer import tokenize
+
+%s
+
+_FAIL = object()
+
+
+class NoParseError(Exception):
+    pass
+
+
+def run(tokens):
+    """Parse a source already split into tokens."""
+    r = _%s(tokens, 0)
+    pos = r[1] if r else 0
+    if r is None or pos < len(tokens):
+        if pos < len(tokens):
+            raise NoParseError("got unexpected token: %%r, expected: end of "
+                               "input" %% (tokens[pos],))
+        raise NoParseError("got unexpected end of input")
+    return r[0]
+
+def parse(source):
+    """Parse a plastix source into a list of blocks."""
+    return run(tokenize(source))
+
+
+'''
+
+def generate(text, name="grammar"):
+    """The source of the parser module for the grammar in text."""
+    imports, text = header(text)
+    rules = Reader(lex(text)).rules()
+    if not rules:
+        raise GrammarError("no rules")
+    for e in rules.values():
+        check(e, rules)
+    empty = fixpoint(rules, nullable, False)
+    firsts = fixpoint(rules, lambda e, r: first(e, r, empty), frozenset())
+    kinds = fixpoint(rules, kind, VALUE)
+    emitter = Emitter(rules, kinds, firsts, empty)
+    for rule in rules:
+        emitter.rule(rule)
+    start = next(iter(rules))
+    return (PRELUDE % (name, '\n'.join(imports), start) +
+            '\n'.join(emitter.lines).rstrip() + '\n')
+
+def check(e, rules):
+    """Raise if e refers to a rule that doesn't exist."""
+    if e[0] == "ref" and e[1] not in rules:
+        raise GrammarError("undefined rule %s" % e[1])
+    if e[0] in ("seq", "choice"):
+        for item in e[1]:
+            check(item, rules)
+    elif e[0] in ("many", "oneplus", "maybe", "skip", "action"):
+        check(e[1], rules)
+
+def main():
+    argparser = argparse.ArgumentParser(
+            description="Compile a grammar to a Python parser module.")
+    argparser.add_argument("grammar", nargs="?", default="grammar.peg")
+    argparser.add_argument("-o", "--output", default="generated.py",
+            help="module to write, - for stdout (default generated.py)")
+    args = argparser.parse_args()
+
+    with open(args.grammar, "r") as f:
+        try:
+            source = generate(f.read(), args.grammar)
+        except GrammarError as e:
+            sys.stderr.write("%s: %s\n" % (args.grammar, e))
+            sys.exit(1)
+    if args.output == "-":
+        sys.stdout.write(source)
+    else:
+        with open(args.output, "w") as f:
+            f.write(source)
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,28 @@
-from parser import document as parser
+from renderer import Renderer
+from resolver import Resolver, flatten
 
+import argparse
+import contextlib
+import os
+import re
 import sys
 
-from elements import (
-        FootnoteRef,
-        Reference
-)
-
 
 class Plastix:
 
-    def __init__(self, parse):
+    # rendered document fragments are kept in memory up to this size and
+    # spill over to a temporary file past it
+    SPOOL = 1 << 20
+
+    def __init__(self, parse, cache=None, longtable=None, figures=None):
         self.parse = parse
+        # a rendercache.RenderCache to reuse the fragments of unchanged
+        # blocks from earlier renders
+        self.cache = cache
+        # tables longer than this many rows are longtables, see Renderer
+        self.longtable = longtable
+        # a figures.Figures to check, measure and convert the images with
+        self.figures = figures
         self.preamble = [
                 "\\documentclass{article}\n",
                 "\\usepackage[utf8]{inputenc}\n",
@@ -19,54 +30,315 @@ class Plastix:
                 "\\usepackage{lmodern}\n",
                 "\\usepackage[english]{babel}\n"
                 ]
-        self.document = []
-        self.references()
-        self.interpret()
 
-    def references(self):
-        self.references = { "references": {}, "footnotes": [] }
+    def rendered(self, resolver):
+        """Render the blocks in a single pass, yielding the preamble and
+        document fragments of each and whether the fragments hold slots
+        that are filled later on."""
+        renderer = Renderer(resolver, self.longtable, self.figures)
+        renderer.required.update(self.preamble)
+        if self.figures is not None and isinstance(self.parse, list):
+            # resolved in the background while the blocks before them
+            # render
+            self.figures.prefetch(self.parse)
+        if self.cache:
+            render = lambda p: self.cache.render(renderer, p)
+        else:
+            render = renderer.render
         for p in self.parse:
-            if isinstance(p, FootnoteRef):
-                self.references["footnotes"].append(p.reference(self.references))
-            elif isinstance(p, Reference):
-                ident, val = p.reference(self.references)
-                ref = { "type":  "cite", "value": val }
-                self.references["references"][ident] = ref
-
-    def interpret(self):
-        print(self.parse)
-        for p in self.parse:
-            tex = p.latex(self.references)
-            self.preamble += tex["preamble"]
-            self.document += tex["document"]
-
-    def latex(self):
-        output = ""
-        for p in self.preamble:
-            output += p
-        output += "\\begin{document}\n"
-        for d in self.document:
-            output += d
-        output += "\\end{document}\n"
-        return output
+            slots = resolver.slots
+            chunks = renderer.chunks(p)
+            if chunks is not None:
+                # written out a chunk at a time, and never cached
+                for _ in chunks:
+                    yield renderer.flush() + (resolver.slots != slots,)
+                    slots = resolver.slots
+            else:
+                render(p)
+            yield renderer.flush() + (resolver.slots != slots,)
+
+    def interpret(self, resolver=None):
+        """Render the blocks in a single pass, yielding the preamble and
+        document fragments of each.
+
+        All the state of a render lives in resolver, a fresh
+        resolver.Resolver unless one is given to collect the diagnostics,
+        so the same blocks can be rendered any number of times, also from
+        several threads at once.
+
+        A block that cites something defined further down is held back,
+        along with the blocks after it, until the definition fills its
+        slot. Whatever is still undefined at the end is left out and
+        reported in the diagnostics of the resolver.
+        """
+        if resolver is None:
+            resolver = Resolver()
+        held = []
+        for p, d, slots in self.rendered(resolver):
+            if held or slots:
+                held.append((p, d, slots))
+                if not resolver.pending:
+                    yield from Plastix.resolved(held)
+                    held = []
+            else:
+                yield (p, d)
+        resolver.finish()
+        yield from Plastix.resolved(held)
+
+    @staticmethod
+    def resolved(held):
+        for p, d, slots in held:
+            yield (p, flatten(d) if slots else d)
+
+    def stream(self, resolver=None):
+        """Yield the LaTeX output piece by piece.
+
+        The fixed preamble goes out before anything is rendered. The
+        preamble the blocks ask for has to come before the document, so the
+        document is spooled while rendering and follows after it.
+
+        Nothing is held back in memory: a slot is spooled as a NUL
+        delimited marker, replaced by its content when the spool is read
+        back, once every slot is filled. This only keeps the slots, so
+        parse blocks from streaming.blocks render in bounded memory.
+        """
+        if resolver is None:
+            resolver = Resolver()
+        yield from self.preamble
+        preamble = []
+        slots = []
+        import tempfile
+        with tempfile.SpooledTemporaryFile(Plastix.SPOOL, "w+") as spool:
+            for p, d, slotted in self.rendered(resolver):
+                preamble += p
+                if slotted:
+                    spool.write(Plastix.marked(d, slots))
+                else:
+                    text = ''.join(d)
+                    if "\0" in text:
+                        text = text.replace("\0", "\0\0")
+                    spool.write(text)
+            resolver.finish()
+            yield from preamble
+            yield "\\begin{document}\n"
+            spool.seek(0)
+            if slots:
+                yield from Plastix.patched(spool, slots)
+            else:
+                while True:
+                    chunk = spool.read(1 << 16)
+                    if not chunk:
+                        break
+                    yield chunk
+        yield "\\end{document}\n"
+
+    @staticmethod
+    def marked(document, slots):
+        """The document fragments with a marker for every slot, numbering
+        the slots in order in slots. A NUL in the text is doubled."""
+        out = []
+        for part in document:
+            if part.__class__ is str:
+                if "\0" in part:
+                    part = part.replace("\0", "\0\0")
+                out.append(part)
+            else:
+                out.append("\0%d\0" % len(slots))
+                slots.append(part)
+        return ''.join(out)
+
+    @staticmethod
+    def patched(spool, slots):
+        """Read the spool back, replacing markers by their slots."""
+        marker = re.compile("\0(\\d*)\0")
+        fill = lambda m: ''.join(flatten((slots[int(m.group(1))],))) \
+                         if m.group(1) else "\0"
+        rest = ""
+        while True:
+            chunk = spool.read(1 << 16)
+            if not chunk:
+                break
+            chunk = rest + chunk
+            # keep an unfinished marker for the next chunk
+            if chunk.count("\0") % 2:
+                cut = chunk.rindex("\0")
+                chunk, rest = chunk[:cut], chunk[cut:]
+            else:
+                rest = ""
+            yield marker.sub(fill, chunk)
+        yield marker.sub(fill, rest)
+
+    def write(self, out, resolver=None):
+        for s in self.stream(resolver):
+            out.write(s)
+
+    def latex(self, resolver=None):
+        return ''.join(self.stream(resolver))
 
 def load(path):
-    plastix = ""
-    with open(path, "r") as f:
-        # hacky way to handle comments
-        lines = f.readlines()
-        outlines = []
-        for line in lines:
-            if line[0] != "%":
-                outlines.append(line)
-        plastix = ''.join(outlines)
-    return plastix
+    # comment lines are left out
+    from mapped import Source
+    return Source(path).text()
 
 def main():
-    if len(sys.argv) > 1:
-        content = load(sys.argv[1])
-        plastix = Plastix(parser.parse(content))
-        sys.stdout.write(plastix.latex())
+    argparser = argparse.ArgumentParser(
+            description="Compile a plastix file to LaTeX.")
+    argparser.add_argument("file", nargs="*",
+            help="plastix file to compile; with more than one file, or "
+                 "directories of .tix files, all of them are compiled in a "
+                 "pool of processes")
+    argparser.add_argument("--no-lexer", action="store_true",
+            help="parse the source char by char instead of lexing it first")
+    argparser.add_argument("--packrat", action="store_true",
+            help="memoize the grammar and report cache hit rates on stderr")
+    argparser.add_argument("--profile", action="store_true",
+            help="report time and the net change in live memory blocks "
+                 "per phase, and time per grammar production, on stderr")
+    argparser.add_argument("-j", "--jobs", type=int,
+            help="worker processes for batch and daemon mode "
+                 "(default: one per cpu)")
+    argparser.add_argument("-o", "--outdir",
+            help="write every file to its own .tex file in this directory "
+                 "instead of all of them to stdout")
+    argparser.add_argument("--cache", metavar="DIR",
+            help="keep parsed documents in this directory and reuse them "
+                 "for unchanged sources")
+    argparser.add_argument("--cache-size", type=int, default=256,
+            metavar="MB", help="size limit of the cache (default 256)")
+    argparser.add_argument("--serve", action="store_true",
+            help="run a daemon compiling the sources sent to it, see "
+                 "client.py")
+    argparser.add_argument("--socket",
+            help="unix socket the daemon listens on")
+    argparser.add_argument("--port", type=int, default=0,
+            help="localhost port the daemon listens on if no --socket is "
+                 "given (default: any free port)")
+    argparser.add_argument("--watch", action="store_true",
+            help="rebuild the files whenever they change, each to a .tex "
+                 "next to it or in --outdir")
+    argparser.add_argument("--interval", type=float, default=0.5,
+            help="seconds between polls in watch mode (default 0.5)")
+    argparser.add_argument("--stream", action="store_true",
+            help="read and parse the file a chunk at a time while "
+                 "rendering, for files too big to hold in memory")
+    argparser.add_argument("--parallel", action="store_true",
+            help="parse the file in a pool of -j processes")
+    argparser.add_argument("--longtable", type=int, metavar="ROWS",
+            help="set tables of more rows as a longtable, written out this "
+                 "many rows at a time (default %d)" % Renderer.LONGTABLE)
+    argparser.add_argument("--engine", default="combinators",
+            choices=["combinators", "generated"],
+            help="parse with the funcparserlib grammar in parser.py or with "
+                 "the parser pgen.py generates from grammar.peg (default "
+                 "combinators)")
+    argparser.add_argument("--assets", metavar="DIR",
+            help="keep the images converted to PNG and the thumbnails in "
+                 "this directory and reuse them for unchanged images")
+    argparser.add_argument("--thumbnails", type=int, metavar="PX",
+            help="include thumbnails no bigger than PX pixels instead of "
+                 "bigger images, for quicker drafts (needs --assets)")
+    args = argparser.parse_args()
+    batch = len(args.file) > 1 or args.outdir \
+            or (args.jobs and not args.parallel) \
+            or any(os.path.isdir(f) for f in args.file)
+    single = args.file and not (args.watch or args.serve or batch)
+    if args.profile and not single:
+        argparser.error("--profile only profiles compiling a single file")
+    if args.engine == "generated" and not single:
+        argparser.error("--engine generated only compiles a single file, "
+                        "not with --watch, --serve or in batch mode")
+    if args.engine == "generated" and (args.no_lexer or args.packrat
+            or args.stream or args.parallel or args.cache):
+        argparser.error("--engine generated parses a single file over the "
+                        "lexer's tokens, without --no-lexer, --packrat, "
+                        "--stream, --parallel or --cache")
+    if args.parallel and (args.cache or args.packrat or args.profile):
+        argparser.error("--parallel parses in worker processes, without "
+                        "--cache, --packrat or --profile")
+    if args.stream and (args.cache or args.packrat or args.profile):
+        argparser.error("--stream parses while rendering, without --cache, "
+                        "--packrat or --profile")
+    if args.thumbnails and not args.assets:
+        argparser.error("--thumbnails needs --assets")
+    if (args.watch or args.serve) and (args.longtable or args.assets):
+        argparser.error("--longtable, --assets and --thumbnails only work "
+                        "when compiling files, not with --watch or --serve")
+
+    if args.watch:
+        if not args.file:
+            argparser.error("give the files or directories to watch")
+        from watch import Watcher
+        Watcher(args.file, args.outdir, args.interval,
+                lexed=not args.no_lexer).run()
+    elif args.serve:
+        from daemon import serve
+        serve(args.socket, args.port, args.jobs)
+    elif batch:
+        from batch import run
+        if run(args.file, args.jobs, args.outdir, lexed=not args.no_lexer,
+               cache=args.cache, limit=args.cache_size << 20,
+               longtable=args.longtable, assets=args.assets,
+               thumbnails=args.thumbnails):
+            sys.exit(1)
+    elif args.file:
+        path = args.file[0]
+        profile = None
+        phase = lambda name: contextlib.nullcontext()
+        if args.profile:
+            from profiling import Profile
+            profile = Profile()
+            phase = profile.phase
+        memo = None
+        if args.packrat:
+            from packrat import Memo
+            memo = Memo()
+        cache = None
+        if args.cache and not memo and not profile:
+            from cache import ParseCache
+            cache = ParseCache(args.cache, args.cache_size << 20)
+        if args.stream:
+            # parsed while rendering, one chunk at a time
+            from streaming import blocks
+            blocks = blocks(path, lexed=not args.no_lexer)
+        else:
+            from mapped import Source
+            with phase("load"):
+                source = Source(path)
+            with phase("parse"):
+                if cache:
+                    blocks = cache.parse(source.text(),
+                            lexed=not args.no_lexer)
+                elif args.engine == "generated":
+                    from generated import run
+                    blocks = run(source.tokens())
+                elif args.parallel:
+                    from parallel import parse
+                    blocks = parse(source.text(), not args.no_lexer,
+                            args.jobs)
+                else:
+                    blocks = source.parse(not args.no_lexer, memo, profile)
+        figures = None
+        if args.stream or any(type(b).__name__ == "Figure" for b in blocks):
+            # only documents with figures pay for importing the pipeline
+            from figures import Figures
+            figures = Figures(os.path.dirname(path), args.assets,
+                              args.thumbnails, args.jobs)
+        resolver = Resolver()
+        with phase("render"):
+            Plastix(blocks, longtable=args.longtable,
+                    figures=figures).write(sys.stdout, resolver)
+        if figures:
+            figures.close()
+        for message in resolver.diagnostics:
+            sys.stderr.write("%s: %s\n" % (path, message))
+        if memo:
+            sys.stderr.write(memo.report())
+        if profile:
+            sys.stderr.write(profile.report())
+        if cache:
+            sys.stderr.write(cache.report())
+        if args.assets and figures:
+            sys.stderr.write(figures.report())
     else:
         print("Please provide a plastix file as first argument.")
 
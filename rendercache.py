@@ -0,0 +1,118 @@
+import hashlib
+import marshal
+import threading
+from collections import OrderedDict
+
+from renderer import Renderer
+from resolver import Slot
+
+# blocks whose output only depends on themselves and on what they cite
+CACHED = ("Section", "Paragraph", "List", "Table")
+
+def structure(node):
+    """The node as nested tuples of class names and field values."""
+    t = type(node)
+    if t is tuple:
+        return tuple(map(structure, node))
+    if t is str or t is int or node is None:
+        return node
+    return (t.__name__,) + tuple([structure(getattr(node, s))
+                                  for s in t.__slots__ if s != "digest"])
+
+def digest(block):
+    """Structural hash of a block, kept on the block after the first time:
+    blocks are never changed after parsing."""
+    d = block.digest
+    if d is None:
+        d = hashlib.blake2b(marshal.dumps(structure(block)),
+                            digest_size=16).digest()
+        block.digest = d
+    return d
+
+
+class Hole(Slot):
+    """A citation or footnote mark in a cached fragment, resolved again
+    every time the fragment is used. node is the InlineRef, or None for a
+    footnote mark."""
+
+    __slots__ = ("node",)
+
+    def __init__(self, node):
+        self.parts = None
+        self.node = node
+
+
+class Recorder:
+    """Stands in for the resolver while a block is rendered into the
+    cache, leaving a Hole for everything the resolver would decide."""
+
+    def cite(self, node):
+        return Hole(node)
+
+    def mark(self):
+        return Hole(None)
+
+
+class RenderCache:
+    """The preamble and document fragments of rendered blocks, keyed by
+    their structural hash.
+
+    Citations and footnote marks are left as holes in the cached fragments
+    and go through the resolver of the render that uses them, so the
+    numbering of footnotes and the references defined in the document never
+    make an entry stale and nothing needs invalidating when they change.
+    The least recently used entries are dropped past `size` entries.
+    """
+
+    def __init__(self, size=4096):
+        self.size = size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def render(self, renderer, block):
+        """Render block with renderer, reusing the cached fragments of an
+        equal block."""
+        if type(block).__name__ not in CACHED:
+            renderer.render(block)
+            return
+        key = digest(block)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+        if entry is None:
+            recorder = Renderer(Recorder(), renderer.longtable)
+            recorder.render(block)
+            entry = (tuple(recorder.preamble), tuple(recorder.document))
+            with self.lock:
+                self.misses += 1
+                self.entries[key] = entry
+                while len(self.entries) > self.size:
+                    self.entries.popitem(last=False)
+                    self.evictions += 1
+        preamble, document = entry
+        renderer.require(*preamble)
+        append = renderer.document.append
+        for part in document:
+            if part.__class__ is Hole:
+                if part.node is None:
+                    # footnote() doesn't look at the Footnote node
+                    renderer.footnote(None)
+                else:
+                    renderer.inlineref(part.node)
+            else:
+                append(part)
+
+    def report(self):
+        total = self.hits + self.misses
+        return "render cache: %d hits, %d misses (%.0f%%), %d evicted\n" % \
+               (self.hits, self.misses,
+                100.0 * self.hits / total if total else 0.0, self.evictions)
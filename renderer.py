@@ -0,0 +1,309 @@
+import re
+from functools import lru_cache
+
+import colors
+from escape import escape
+from resolver import Resolver, Slot, flatten
+
+# "\\textbf{%s}" -> ("\\textbf{", "}")
+@lru_cache(maxsize=None)
+def split(template):
+    return tuple(template.split("%s"))
+
+# a table cell holding nothing but a number
+NUMBER = re.compile(r"\s*[+-]?[\d.,]*\d[\d.,]*%?\s*$")
+
+def columns(table):
+    """The column spec of table, found in one pass over its rows: as many
+    columns as the longest row has cells, right aligned if they only hold
+    numbers and left aligned otherwise."""
+    numeric = []
+    for row in table.rows:
+        cells = row.cells
+        if len(cells) > len(numeric):
+            numeric += [True] * (len(cells) - len(numeric))
+        for i, cell in enumerate(cells):
+            if numeric[i]:
+                content = cell.content
+                numeric[i] = len(content) == 1 and \
+                        type(content[0]) is str and \
+                        NUMBER.match(content[0]) is not None
+    return "|" + ''.join("r|" if n else "l|" for n in numeric)
+
+LISTS = { "*": "itemize", "#": "enumerate" }
+
+
+class Renderer:
+    """Render AST nodes to LaTeX in a single pass.
+
+    Every node appends its output to one shared document buffer and its
+    preamble to one shared preamble list, so nested inlines are written
+    once instead of being joined again at every level. Nodes are dispatched
+    on their type to the method with the lowercased class name, text runs,
+    which are plain strs, to string.
+
+    Citations and footnote marks are resolved by a resolver.Resolver, the
+    document buffer holds a Slot for those that are not defined yet.
+    """
+
+    # tables with more rows than this are set as a longtable, which breaks
+    # across pages, and written out this many rows at a time
+    LONGTABLE = 500
+    # lists are written out this many items at a time
+    LISTCHUNK = 500
+    # lists nest up to this deep. Past four levels LaTeX needs enumitem,
+    # and the preamble that sets it up to this depth
+    LISTDEPTH = 32
+    DEEPLISTS = [ "\\usepackage{enumitem}\n"
+                , "\\setlistdepth{%d}\n" % LISTDEPTH
+                , "\\renewlist{itemize}{itemize}{%d}\n" % LISTDEPTH
+                , "\\renewlist{enumerate}{enumerate}{%d}\n" % LISTDEPTH
+                , "\\setlist[itemize]{label=\\textbullet}\n"
+                , "\\setlist[enumerate]{label=\\arabic*.}\n"
+                ]
+
+    # the width of an image of this many pixels or more is the line width,
+    # narrower ones keep their size, a pixel being a point as in pdflatex
+    LINEWIDTH = 345
+
+    def __init__(self, resolver, longtable=None, figures=None):
+        self.resolver = resolver
+        self.longtable = longtable or Renderer.LONGTABLE
+        # a figures.Figures checking and measuring the images, which are
+        # boxed in place without one
+        self.figures = figures
+        self.preamble = []
+        # every line ever written to the preamble, which never takes one
+        # twice
+        self.required = set()
+        self.document = []
+        # text runs are plain strs
+        self.dispatch = { str: self.string }
+        # rendering the text of a footnote
+        self.note = False
+
+    def flush(self):
+        """Return the preamble and document written so far and start
+        empty ones."""
+        preamble, document = self.preamble, self.document
+        self.preamble = []
+        self.document = []
+        return (preamble, document)
+
+    def require(self, *lines):
+        """Add lines to the preamble, those that aren't in it yet."""
+        for line in lines:
+            if line not in self.required:
+                self.required.add(line)
+                self.preamble.append(line)
+
+    def render(self, node):
+        visit = self.dispatch.get(type(node))
+        if visit is None:
+            visit = getattr(self, type(node).__name__.lower())
+            self.dispatch[type(node)] = visit
+        visit(node)
+
+    def inlines(self, inlines):
+        render = self.render
+        for x in inlines:
+            render(x)
+
+    def wrap(self, template, inlines):
+        before, after = split(template)
+        self.document.append(before)
+        self.inlines(inlines)
+        self.document.append(after)
+
+    def lines(self, lines):
+        # lines are joined by a space, as soon as there is something to
+        # join. Only non-empty strings are ever written.
+        start = len(self.document)
+        for line in lines:
+            if len(self.document) > start:
+                self.document.append(" ")
+            self.inlines(line)
+
+    # blocks
+    def paragraph(self, node):
+        self.lines(node.text)
+        if node.newlines:
+            self.render(node.newlines)
+        self.document.append("\n")
+
+    def section(self, node):
+        self.wrap(node.LATEX[node.level], node.text)
+        self.document.append("\n")
+
+    def footnoteref(self, node):
+        document = self.document
+        self.document = []
+        self.note = True
+        self.wrap(node.NOTE, node.inline)
+        self.note = False
+        self.resolver.note(self.document)
+        self.document = document
+
+    def reference(self, node):
+        self.resolver.define(node.ident, node)
+
+    def figure(self, node):
+        self.require("\\usepackage{graphicx}\n")
+        if self.figures is None:
+            # there is nowhere to look for the image
+            include, dims = None, None
+            self.resolver.diagnostics.append(
+                    "Figure '%s' not checked, left out" % node.path)
+        else:
+            asset = self.figures.get(node.path)
+            if asset.error:
+                self.resolver.diagnostics.append(asset.error)
+            include = asset.include
+            dims = asset.dimensions
+        self.document.append("\\begin{figure}[htbp]\n\\centering\n")
+        if include is None:
+            # a box in its place, so the document still compiles
+            self.document.append("\\fbox{\\texttt{%s}}\n" %
+                                 escape(node.path))
+        else:
+            width = "\\linewidth"
+            if dims and dims[0] < Renderer.LINEWIDTH:
+                width = "%.2f\\linewidth" % (dims[0] / Renderer.LINEWIDTH)
+            self.document.append("\\includegraphics[width=%s,height="
+                                 "\\textheight,keepaspectratio]{%s}\n" %
+                                 (width, include))
+        if node.caption:
+            self.document.append("\\caption{")
+            self.lines(node.caption)
+            self.document.append("}\n")
+        if node.label:
+            self.document.append("\\label{%s}\n" % node.label)
+            self.resolver.define(node.label, node, "ref")
+        self.document.append("\\end{figure}\n")
+
+    def chunks(self, node):
+        """For a block too long to render in one go, a generator rendering
+        it that yields whenever the output so far can be flushed. None for
+        any other node."""
+        name = type(node).__name__
+        if name == "Table" and len(node.rows) > self.longtable:
+            return self.rows(node)
+        if name == "List" and len(node.items) > Renderer.LISTCHUNK:
+            return self.items(node)
+        return None
+
+    def list(self, node):
+        for _ in self.items(node):
+            pass
+
+    def items(self, node):
+        """Render the list node, nesting its flat items by their
+        indentation, in one pass over them. Yields after every LISTCHUNK
+        items, when the output so far can be flushed."""
+        # indentation and environment of the open lists, innermost last
+        stack = []
+        for i, item in enumerate(node.items, 1):
+            indent = item.indentation
+            env = LISTS[item.listType]
+            while stack and indent < stack[-1][0]:
+                self.document.append("\\end{%s}\n" % stack.pop()[1])
+            if stack and indent == stack[-1][0] and env != stack[-1][1]:
+                # a list of the other kind at the same level
+                self.document.append("\\end{%s}\n" % stack.pop()[1])
+            if not stack or indent > stack[-1][0] and \
+                    len(stack) < Renderer.LISTDEPTH:
+                if len(stack) == 4:
+                    self.require(*Renderer.DEEPLISTS)
+                self.document.append("\\begin{%s}\n" % env)
+                stack.append((indent, env))
+            self.listitem(item)
+            if i % Renderer.LISTCHUNK == 0:
+                yield
+        while stack:
+            self.document.append("\\end{%s}\n" % stack.pop()[1])
+
+    def listitem(self, node):
+        self.document.append("\\item ")
+        self.lines(node.item)
+        self.document.append("\n")
+
+    def table(self, node):
+        for _ in self.rows(node):
+            pass
+
+    def rows(self, node):
+        """Render the table node, yielding after every `longtable` rows of
+        a long table, when the output so far can be flushed."""
+        long = len(node.rows) > self.longtable
+        env = "longtable" if long else "tabular"
+        if long:
+            self.require("\\usepackage{longtable}\n")
+        self.document.append("\\begin{%s}{%s}\n\\hline\n" %
+                             (env, columns(node)))
+        for i, row in enumerate(node.rows, 1):
+            self.tablerow(row)
+            if long and i % self.longtable == 0:
+                yield
+        self.document.append("\\end{%s}\n" % env)
+
+    def tablerow(self, node):
+        for i, cell in enumerate(node.cells):
+            if i:
+                self.document.append(" & ")
+            self.inlines(cell.content)
+        self.document.append(" \\\\\n\\hline\n")
+
+    def tablecell(self, node):
+        self.inlines(node.content)
+
+    # inlines
+    def string(self, text):
+        self.document.append(escape(text))
+
+    def newline(self, node):
+        self.document.append(node.lines)
+
+    def bold(self, node):
+        self.wrap(node.LATEX, node.text)
+
+    def italic(self, node):
+        self.wrap(node.LATEX, node.text)
+
+    def underline(self, node):
+        self.wrap(node.LATEX, node.text)
+
+    def color(self, node):
+        name, definition = colors.definition(colors.rgb(node.color))
+        self.require("\\usepackage{xcolor}\n", definition)
+        self.document.append("\\textcolor{%s}{" % name)
+        self.inlines(node.text)
+        self.document.append("}")
+
+    def escaped(self, node):
+        self.document.append(escape(node.char))
+
+    def footnote(self, node):
+        if self.note:
+            # it would take its own text, or one from further down
+            self.resolver.diagnostics.append("footnote inside a footnote")
+            return
+        note = self.resolver.mark()
+        if isinstance(note, Slot):
+            self.document.append(note)
+        else:
+            self.document += note
+
+    def inlineref(self, node):
+        self.document.append(self.resolver.cite(node))
+
+
+def render(node, resolver=None):
+    """Render a single node into the {"preamble", "document"} dict the
+    latex() methods return. Whatever the node cites must already be
+    defined in resolver."""
+    if resolver is None:
+        resolver = Resolver()
+    renderer = Renderer(resolver)
+    renderer.render(node)
+    return { "preamble": renderer.preamble,
+             "document": [''.join(flatten(renderer.document))] }
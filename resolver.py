@@ -0,0 +1,123 @@
+from collections import deque
+
+
+class Slot:
+    """Output that depends on a definition further down the document. The
+    renderer writes the slot in place of the output and the resolver fills
+    in its parts when the definition is rendered."""
+
+    __slots__ = ("parts",)
+
+    def __init__(self):
+        self.parts = None
+
+def flatten(parts, out=None):
+    """The strings of rendered output, with the parts of every filled slot
+    in its place."""
+    if out is None:
+        out = []
+    for part in parts:
+        if part.__class__ is str:
+            out.append(part)
+        elif part.parts:
+            flatten(part.parts, out)
+    return out
+
+
+class Resolver:
+    """References and footnotes of one document, resolved while it is
+    rendered in a single pass. This is all the state of a render: the
+    content of the AST and the renderer's templates are never changed, so
+    every render that has its own resolver is independent of the others.
+
+    A citation of a label that is already defined, or a footnote whose
+    text was already rendered, is resolved right away. Otherwise a Slot is
+    handed out and filled when the definition comes. The nth footnote mark
+    gets the nth footnote text, so both wait in a queue for the other.
+    Problems are collected in `diagnostics`.
+    """
+
+    def __init__(self):
+        # label -> {"type", "value"}
+        self.references = {}
+        self.used = set()
+        # label -> [(slot, InlineRef)] of citations waiting for the label
+        self.waiting = {}
+        # footnote texts without a mark yet, with whether they hold slots,
+        # and marks without a text yet
+        self.notes = deque()
+        self.marks = deque()
+        # output with slots handed out, and how many slots are not filled
+        self.slots = 0
+        self.pending = 0
+        self.diagnostics = []
+
+    def slot(self):
+        self.slots += 1
+        self.pending += 1
+        return Slot()
+
+    def fill(self, slot, parts):
+        slot.parts = parts
+        self.pending -= 1
+
+    def define(self, label, node, type="cite"):
+        """Define label as node, cited with the InlineRef.REF of type."""
+        if label in self.references:
+            self.diagnostics.append("Reference '%s' defined twice" % label)
+        ref = { "type": type, "value": node }
+        self.references[label] = ref
+        for slot, inlineref in self.waiting.pop(label, ()):
+            self.fill(slot, (inlineref.REF[ref["type"]] % label,))
+            self.used.add(label)
+
+    def cite(self, node):
+        """The output of an InlineRef, a string or a Slot."""
+        ref = self.references.get(node.label)
+        if ref is not None:
+            self.used.add(node.label)
+            return node.REF[ref["type"]] % node.label
+        slot = self.slot()
+        self.waiting.setdefault(node.label, []).append((slot, node))
+        return slot
+
+    def note(self, parts):
+        """Take the rendered \\footnote of a footnote text."""
+        if self.marks:
+            self.fill(self.marks.popleft(), parts)
+        else:
+            slotted = any(part.__class__ is not str for part in parts)
+            self.notes.append((parts, slotted))
+
+    def mark(self):
+        """The output of a footnote mark, its \\footnote parts or a Slot."""
+        if self.notes:
+            parts, slotted = self.notes.popleft()
+            if slotted:
+                self.slots += 1
+            return parts
+        slot = self.slot()
+        self.marks.append(slot)
+        return slot
+
+    def finish(self):
+        """Empty the slots that never got their definition and report
+        them, along with definitions that were never used."""
+        for label, waiting in self.waiting.items():
+            for slot, _ in waiting:
+                self.fill(slot, ())
+                self.diagnostics.append(
+                        "Reference '%s' not defined in document" % label)
+        self.waiting = {}
+        while self.marks:
+            self.fill(self.marks.popleft(), ())
+            self.diagnostics.append("too many footnotes")
+        for label, ref in self.references.items():
+            # a figure may well be labelled and never cited
+            if label not in self.used and ref["type"] == "cite":
+                self.diagnostics.append(
+                        "Reference '%s' is never used" % label)
+        if self.notes:
+            self.diagnostics.append(
+                    "%d footnote texts are never used" % len(self.notes))
+            self.notes.clear()
@@ -0,0 +1,37 @@
+from parser import parse
+
+# Blocks never reach over a blank line (see incremental.py), and lists and
+# tables end at the first blank line, so cutting the source after every run
+# of blank lines never cuts through a block.
+
+def chunks(lines):
+    """Yield the source read from lines (an open file) in chunks ending
+    after a run of blank lines, leaving out comment lines the way load()
+    does. The chunks are those incremental.split gives for load()'s
+    output."""
+    chunk = []
+    # blank lines at the end of chunk
+    blank = 0
+    for line in lines:
+        if line[0] == "%":
+            continue
+        if line == "\n":
+            blank += 1
+            chunk.append(line)
+            continue
+        # the run is the newline ending the last line, if there is one,
+        # and the blank lines
+        if blank and blank + (len(chunk) > blank) > 1:
+            yield ''.join(chunk)
+            chunk = []
+        blank = 0
+        chunk.append(line)
+    if chunk:
+        yield ''.join(chunk)
+
+def blocks(path, lexed=True):
+    """Parse the file at path one chunk at a time, yielding its blocks. Only
+    one chunk is ever in memory, however big the file."""
+    with open(path, "r") as f:
+        for chunk in chunks(f):
+            yield from parse(chunk, lexed=lexed)
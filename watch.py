@@ -0,0 +1,148 @@
+import os
+import sys
+import time
+
+from batch import expand
+from figures import Figures
+from incremental import Incremental
+from plastix import Plastix, load
+from rendercache import RenderCache
+from resolver import Resolver
+
+def stat(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+def snapshot(paths):
+    """{path: (name, stat)} for every file to watch, found again on every
+    poll so new files in watched directories are picked up."""
+    return { path: (name, stat(path)) for path, name in expand(paths) }
+
+def write(path, content):
+    """Write content to path unless it already holds exactly that. Returns
+    whether the file was written."""
+    try:
+        with open(path, "r") as f:
+            if f.read() == content:
+                return False
+    except OSError:
+        pass
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        f.write(content)
+    os.replace(tmp, path)
+    return True
+
+
+class Watcher:
+    """Rebuild .tix files whenever they change, found by polling their
+    mtime and size.
+
+    A change starts a rebuild once no file changed for `debounce` seconds,
+    so a burst of saves is built once. Every file has its own incremental
+    parser and all share a render cache, so a rebuild only parses and
+    renders the blocks that changed.
+    """
+
+    def __init__(self, paths, outdir=None, interval=0.5, debounce=0.3,
+                 lexed=True, log=sys.stderr):
+        self.paths = paths
+        self.outdir = outdir
+        self.interval = interval
+        self.debounce = debounce
+        self.lexed = lexed
+        self.log = log
+        self.parsers = {}
+        self.cache = RenderCache()
+        self.files = {}
+        # output name -> the path built to it, with an outdir
+        self.owners = {}
+
+    def output(self, path, name):
+        if self.outdir:
+            out = os.path.join(self.outdir, name)
+            os.makedirs(os.path.dirname(out), exist_ok=True)
+            return out
+        return os.path.splitext(path)[0] + ".tex"
+
+    def build(self, path, name):
+        if self.outdir:
+            owner = self.owners.setdefault(name, path)
+            if owner != path:
+                self.log.write("%s: output %s is also that of %s, not "
+                               "built\n" % (path, name, owner))
+                return
+        clock = time.perf_counter
+        start = clock()
+        try:
+            content = load(path)
+            if path not in self.parsers:
+                self.parsers[path] = Incremental(self.lexed)
+            blocks = self.parsers[path].parse(content)
+            parsed = clock()
+            figures = Figures(os.path.dirname(path))
+            resolver = Resolver()
+            try:
+                latex = Plastix(blocks, self.cache,
+                                figures=figures).latex(resolver)
+            finally:
+                figures.close()
+            rendered = clock()
+            written = write(self.output(path, name), latex)
+        except Exception as e:
+            self.log.write("%s: %s: %s\n" % (path, type(e).__name__, e))
+            return
+        for message in resolver.diagnostics:
+            self.log.write("%s: %s\n" % (path, message))
+        self.log.write("%s: %s in %.1fms (parse %.1fms, %d/%d chunks "
+                       "reused, render %.1fms)\n" %
+                       (path, "rebuilt" if written else "unchanged",
+                        (clock() - start) * 1e3, (parsed - start) * 1e3,
+                        self.parsers[path].reused,
+                        self.parsers[path].reused + self.parsers[path].parsed,
+                        (rendered - parsed) * 1e3))
+
+    def changed(self):
+        """Files that changed or appeared since the last poll."""
+        files = snapshot(self.paths)
+        changed = [(path, name) for path, (name, st) in files.items()
+                   if st is not None and self.files.get(path) != (name, st)]
+        for path in self.files.keys() - files.keys():
+            self.parsers.pop(path, None)
+            name = self.files[path][0]
+            if self.owners.get(name) == path:
+                del self.owners[name]
+        self.files = files
+        return changed
+
+    def poll(self):
+        """Wait for changes and build them, once the files stopped
+        changing."""
+        changed = {}
+        while True:
+            for path, name in self.changed():
+                changed[path] = name
+            if not changed:
+                time.sleep(self.interval)
+                continue
+            time.sleep(self.debounce)
+            more = self.changed()
+            if more:
+                for path, name in more:
+                    changed[path] = name
+                continue
+            return changed
+
+    def run(self):
+        for path, name in self.changed():
+            self.build(path, name)
+        self.log.write("watching %d files\n" % len(self.files))
+        try:
+            while True:
+                for path, name in self.poll().items():
+                    self.build(path, name)
+        except KeyboardInterrupt:
+            pass